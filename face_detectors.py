@@ -0,0 +1,188 @@
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+######################################################################
+# Face detectors for video_filter.py. Every backend counts faces in
+# frames already scaled down to the detection width:
+#   haar       OpenCV frontal-face Haar cascade (gray input, the default)
+#   yunet      OpenCV DNN YuNet (cv2.FaceDetectorYN), finds profiles too
+#   ssd        OpenCV DNN ResNet-10 SSD, batched over several frames
+#   mediapipe  MediaPipe face landmarker, with the repo's face_landmarker.task
+#
+# DNN model files are not in the repo; by default they are looked up in
+# models/ next to this file:
+#   yunet: face_detection_yunet_2023mar.onnx (opencv_zoo)
+#   ssd:   res10_300x300_ssd_iter_140000.caffemodel + deploy.prototxt
+#          (opencv samples/dnn/face_detector)
+#
+# detect() returns the face boxes (x, y, w, h) of one frame (or of a
+# region of it), count() their number. count_batch() takes a list of
+# frames; backends that can run one inference over several frames (ssd)
+# do so, the others loop. threads sets the OpenCV thread count (0 keeps
+# the library default).
+######################################################################
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(REPO_DIR, "models")
+
+
+def downscale(frame, width, gray=True):
+    """Frame scaled down to at most `width`, gray or BGR (frames already scaled pass through)."""
+    if gray and frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    elif not gray and frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    h, w = frame.shape[:2]
+    if w > width:
+        scale = width / float(w)
+        frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
+    return frame
+
+
+def _model_path(model, default):
+    path = model or os.path.join(MODEL_DIR, default)
+    if not os.path.exists(path):
+        raise RuntimeError(f"Detector model not found: {path} (download it or pass --detector-model)")
+    return path
+
+
+class FaceDetector:
+    name = None
+    color = False      # wants BGR input instead of gray
+    batch_size = 1     # frames per inference
+
+    def __init__(self, model, threads=0):
+        self.model = model
+        self.version = f"{self.name}:{os.path.basename(model)}"
+        if threads > 0:
+            cv2.setNumThreads(threads)
+
+    def prepare(self, frame, width):
+        return downscale(frame, width, gray=not self.color)
+
+    def detect(self, img) -> List[Tuple[int, int, int, int]]:
+        raise NotImplementedError
+
+    def count(self, img) -> int:
+        return len(self.detect(img))
+
+    def count_batch(self, imgs) -> List[int]:
+        return [self.count(img) for img in imgs]
+
+
+class HaarDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, model=None, threads=0, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        model = model or cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        super().__init__(model, threads)
+        self.cascade = cv2.CascadeClassifier(model)
+        if self.cascade.empty():
+            raise RuntimeError("Failed to load Haar cascade. Ensure opencv-data is available.")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, img):
+        faces = self.cascade.detectMultiScale(img, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                              minSize=self.min_size)
+        return [tuple(int(v) for v in f) for f in faces]
+
+
+class YuNetDetector(FaceDetector):
+    name = "yunet"
+    color = True
+
+    def __init__(self, model=None, threads=0, score_threshold=0.6):
+        super().__init__(_model_path(model, "face_detection_yunet_2023mar.onnx"), threads)
+        self.net = cv2.FaceDetectorYN.create(self.model, "", (320, 320), score_threshold, 0.3, 5000)
+        self.input_size = (320, 320)
+
+    def detect(self, img):
+        size = (img.shape[1], img.shape[0])
+        if size != self.input_size:
+            self.net.setInputSize(size)
+            self.input_size = size
+        _, faces = self.net.detect(np.ascontiguousarray(img))
+        return [] if faces is None else [tuple(int(v) for v in f[:4]) for f in faces]
+
+
+class SsdDetector(FaceDetector):
+    name = "ssd"
+    color = True
+
+    def __init__(self, model=None, threads=0, confidence=0.5, batch_size=16):
+        super().__init__(_model_path(model, "res10_300x300_ssd_iter_140000.caffemodel"), threads)
+        prototxt = _model_path(None if model is None else os.path.join(os.path.dirname(model), "deploy.prototxt"),
+                               "deploy.prototxt")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, self.model)
+        self.confidence = confidence
+        self.batch_size = batch_size
+
+    def detect(self, img):
+        h, w = img.shape[:2]
+        self.net.setInput(cv2.dnn.blobFromImage(img, 1.0, (300, 300), (104.0, 177.0, 123.0)))
+        det = self.net.forward().reshape(-1, 7)
+        det = det[det[:, 2] > self.confidence, 3:7] * [w, h, w, h]
+        return [(int(x0), int(y0), int(x1 - x0), int(y1 - y0)) for x0, y0, x1, y1 in det]
+
+    def count(self, img) -> int:
+        return self.count_batch([img])[0]
+
+    def count_batch(self, imgs) -> List[int]:
+        counts = []
+        for i in range(0, len(imgs), self.batch_size):
+            chunk = imgs[i : i + self.batch_size]
+            blob = cv2.dnn.blobFromImages(chunk, 1.0, (300, 300), (104.0, 177.0, 123.0))
+            self.net.setInput(blob)
+            det = self.net.forward().reshape(-1, 7)   # [image, label, confidence, x0, y0, x1, y1]
+            hits = det[det[:, 2] > self.confidence, 0].astype(np.int64)
+            counts.extend(np.bincount(hits, minlength=len(chunk))[: len(chunk)].tolist())
+        return counts
+
+
+class MediaPipeDetector(FaceDetector):
+    name = "mediapipe"
+    color = True
+
+    def __init__(self, model=None, threads=0, num_faces=4):
+        import mediapipe as mp
+        from mediapipe.tasks import python as mp_tasks
+        from mediapipe.tasks.python import vision
+
+        super().__init__(model or os.path.join(REPO_DIR, "face_landmarker.task"), threads)
+        options = vision.FaceLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=self.model),
+            running_mode=vision.RunningMode.IMAGE,
+            num_faces=num_faces,
+        )
+        self.mp = mp
+        self.landmarker = vision.FaceLandmarker.create_from_options(options)
+
+    def detect(self, img):
+        h, w = img.shape[:2]
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        result = self.landmarker.detect(self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=rgb))
+        boxes = []
+        for landmarks in result.face_landmarks:
+            xs = [p.x * w for p in landmarks]
+            ys = [p.y * h for p in landmarks]
+            boxes.append((int(min(xs)), int(min(ys)), int(max(xs) - min(xs)), int(max(ys) - min(ys))))
+        return boxes
+
+
+DETECTORS = {
+    "haar": HaarDetector,
+    "yunet": YuNetDetector,
+    "ssd": SsdDetector,
+    "mediapipe": MediaPipeDetector,
+}
+
+
+def create_detector(name: str = "haar", model: Optional[str] = None, threads: int = 0) -> FaceDetector:
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector: {name} (choose from {', '.join(DETECTORS)})")
+    return DETECTORS[name](model=model, threads=threads)
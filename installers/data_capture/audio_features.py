@@ -0,0 +1,104 @@
+import numpy as np
+
+from audio_reader import FEATURE_DTYPE
+
+######################################################################
+# Cheap streaming acoustic features, computed by microphone.Mic on the
+# raw mono signal (before scrambling) at ~10 Hz:
+#   rms_db       level in dBFS
+#   noise_db     tracked noise floor in dBFS
+#   speech_ratio share of energy in the 80-4000 Hz voice band
+#   vad          1 if the frame looks like speech (level well above the
+#                noise floor and mostly speech-band energy)
+#   flux         spectral flux (mean positive change of the log spectrum)
+#   overlap      overlapping-speakers indicator, 0..1: a single voice has
+#                a clear pitch period, several voices at once smear the
+#                autocorrelation peak. Only a heuristic, 0 outside speech.
+#
+# Each hop is split into ~20 ms sub-frames (power-of-two FFT size); all
+# sub-frames of a block are processed with one batched FFT.
+######################################################################
+
+
+class AudioFeatures:
+    def __init__(self, sampling_rate, rate=10.0, vad_margin_db=6.0, floor_rise_db=0.05):
+        """
+        Args:
+            sampling_rate (int): Rate of the incoming signal.
+            rate (float): Feature frames per second.
+            vad_margin_db (float): Level above the noise floor needed for speech.
+            floor_rise_db (float): How fast (dB per frame) the noise floor follows a louder background.
+        """
+        self.fs = int(sampling_rate)
+        self.hop = int(round(self.fs / rate))
+        self.sub = int(2 ** round(np.log2(0.02 * self.fs)))
+        self.n_sub = max(1, self.hop // self.sub)
+        self.vad_margin_db = vad_margin_db
+        self.floor_rise_db = floor_rise_db
+
+        freqs = np.fft.rfftfreq(self.sub, 1.0 / self.fs)
+        self._speech_band = (freqs >= 80) & (freqs <= 4000)
+        self._window = np.hanning(self.sub).astype(np.float32)
+        self._min_lag = int(self.fs / 400)   # 400 Hz pitch
+        self._max_lag = min(int(self.fs / 80), self.sub - 1)  # 80 Hz pitch
+
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._prev_logspec = None
+        self._noise_db = None
+
+    def process(self, x, end_time):
+        """Feeds mono samples whose last sample was captured at end_time (epoch seconds).
+
+        Returns the FEATURE_DTYPE records of all hops completed by this block.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        buf = np.concatenate([self._buf, x]) if self._buf.size else x
+        n_frames = buf.size // self.hop
+        self._buf = buf[n_frames * self.hop :]
+
+        out = np.zeros(n_frames, dtype=FEATURE_DTYPE)
+        if n_frames == 0:
+            return out
+
+        frames = buf[: n_frames * self.hop].reshape(n_frames, self.hop)
+
+        # Frame end times, counted back from the last received sample
+        ends = (np.arange(1, n_frames + 1) * self.hop - buf.size).astype(np.float64)
+        out["time"] = end_time + ends / self.fs
+
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        out["rms_db"] = 20 * np.log10(rms + 1e-10)
+
+        # --- Sub-frame spectra of the whole block at once
+        subs = frames[:, : self.n_sub * self.sub].reshape(n_frames * self.n_sub, self.sub)
+        power = np.square(np.abs(np.fft.rfft(subs * self._window, axis=1)))
+        total = power.sum(axis=1) + 1e-12
+        speech = power[:, self._speech_band].sum(axis=1) / total
+        out["speech_ratio"] = speech.reshape(n_frames, self.n_sub).mean(axis=1)
+
+        # --- Spectral flux between consecutive sub-frames (carried across calls)
+        logspec = np.log10(power + 1e-10)
+        prev = self._prev_logspec if self._prev_logspec is not None else logspec[:1]
+        diff = np.diff(np.concatenate([prev, logspec]), axis=0)
+        flux = np.maximum(diff, 0).mean(axis=1)
+        out["flux"] = flux.reshape(n_frames, self.n_sub).mean(axis=1)
+        self._prev_logspec = logspec[-1:]
+
+        # --- Pitch clarity from the autocorrelation (Wiener-Khinchin, zero padded)
+        acf = np.fft.irfft(np.abs(np.fft.rfft(subs, n=2 * self.sub, axis=1)) ** 2, axis=1)
+        peak = acf[:, self._min_lag : self._max_lag + 1].max(axis=1) / (acf[:, 0] + 1e-12)
+        clarity = np.clip(peak, 0.0, 1.0).reshape(n_frames, self.n_sub)
+
+        # --- Noise floor and voice activity, frame by frame (tiny loop at 10 Hz)
+        for i in range(n_frames):
+            level = float(out["rms_db"][i])
+            if self._noise_db is None or level < self._noise_db:
+                self._noise_db = level
+            else:
+                self._noise_db += self.floor_rise_db
+            out["noise_db"][i] = self._noise_db
+
+        vad = (out["rms_db"] > out["noise_db"] + self.vad_margin_db) & (out["speech_ratio"] > 0.5)
+        out["vad"] = vad
+        out["overlap"] = np.where(vad, 1.0 - clarity.mean(axis=1), 0.0)
+        return out
@@ -0,0 +1,171 @@
+import os
+import wave
+
+import numpy as np
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+######################################################################
+# Reader for the audio chunks written by microphone.Mic
+# ({name}_chunk{n}_{time}.wav / .flac / .opus) and their sidecars:
+#   .feat  FEATURE_DTYPE records at ~10 Hz, see audio_features.py
+#   .ts    TIMING_DTYPE records, one per write (~2 Hz): which device frame
+#          the file sample at the start of the write came from, and the
+#          PortAudio / host clock readings of one callback block, so file
+#          samples can be mapped to wall-clock time (audio_timing_model).
+######################################################################
+
+FEATURE_DTYPE = np.dtype(
+    [
+        ("time", "<f8"),          # epoch seconds at the end of the frame
+        ("rms_db", "<f4"),
+        ("noise_db", "<f4"),
+        ("speech_ratio", "<f4"),
+        ("flux", "<f4"),
+        ("overlap", "<f4"),
+        ("vad", "u1"),
+    ]
+)
+
+TIMING_DTYPE = np.dtype(
+    [
+        ("sample", "<u8"),        # file sample index (in this chunk) at the start of a write
+        ("frame", "<f8"),         # device frame index that file sample came from
+        ("cb_frame", "<u8"),      # first device frame of a callback block ...
+        ("adc_time", "<f8"),      # ... its PortAudio inputBufferAdcTime
+        ("monotonic", "<f8"),     # ... time.monotonic() in the callback
+        ("time", "<f8"),          # ... the same moment in epoch seconds
+    ]
+)
+
+
+def read_audio_chunk(path, block=65536, tail_block=1024):
+    """Reads a whole audio chunk as float32 in [-1, 1].
+
+    Also works on chunks that were not closed properly (recording killed):
+    a WAV is read up to the last complete sample, FLAC / Opus up to the last
+    block the encoder flushed. When a large read hits the truncated end,
+    the rest is re-read in `tail_block` frames, so only the incomplete last
+    encoder frame is lost.
+
+    Returns:
+        (np.ndarray, int): samples of shape (frames,) or (frames, channels), and the sample rate.
+    """
+    if os.path.splitext(path)[1].lower() == ".wav":
+        return _read_wav(path)
+
+    if sf is None:
+        raise RuntimeError("Reading FLAC / Opus chunks needs the soundfile package")
+
+    blocks = []
+    good = 0  # frames decoded so far
+    with sf.SoundFile(path) as f:
+        rate = f.samplerate
+        try:
+            while True:
+                b = f.read(block, dtype="float32")
+                if len(b) == 0:
+                    break
+                blocks.append(b)
+                good += len(b)
+        except RuntimeError as e:
+            # Truncated stream: keep what could be decoded
+            print(f"Truncated audio chunk {path}: {e}")
+            truncated = True
+        else:
+            truncated = False
+
+    if truncated:
+        # The failed read dropped a whole block; reopen (the decoder is in an
+        # error state), skip the good frames (seeking fails without a
+        # finished header) and read on in small steps
+        try:
+            with sf.SoundFile(path) as f:
+                while good > 0:
+                    n = len(f.read(min(block, good), dtype="float32"))
+                    if n == 0:
+                        break
+                    good -= n
+                while True:
+                    b = f.read(tail_block, dtype="float32")
+                    if len(b) == 0:
+                        break
+                    blocks.append(b)
+        except RuntimeError:
+            pass
+
+    data = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return data, rate
+
+
+def _read_wav(path):
+    with wave.open(path, "rb") as wf:
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        raw = wf.readframes(wf.getnframes())
+
+    # Header not patched yet (process died right after a write): the wave
+    # module always writes a 44-byte header, the rest is PCM data
+    if len(raw) == 0 and os.path.getsize(path) > 44:
+        with open(path, "rb") as f:
+            f.seek(44)
+            raw = f.read()
+
+    if width != 2:
+        raise ValueError(f"Only 16-bit WAV chunks are supported, got {8 * width}-bit: {path}")
+
+    n = len(raw) // (2 * channels) * channels
+    data = np.frombuffer(raw[: 2 * n], dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        data = data.reshape(-1, channels)
+    return data, rate
+
+
+def read_audio_features(path):
+    """Feature records of a chunk, path to either the audio file or the .feat file.
+
+    A sidecar cut short by a crash is read up to the last complete record.
+    """
+    return _read_records(path.rsplit(".", 1)[0] + ".feat", FEATURE_DTYPE)
+
+
+def _read_records(path, dtype):
+    raw = np.fromfile(path, dtype=np.uint8)
+    n = raw.size // dtype.itemsize
+    return raw[: n * dtype.itemsize].view(dtype)
+
+
+def read_audio_timestamps(path):
+    """Timing records of a chunk (TIMING_DTYPE), path to either the audio file or the .ts file."""
+    return _read_records(path.rsplit(".", 1)[0] + ".ts", TIMING_DTYPE)
+
+
+def audio_timing_model(path):
+    """Linear timing model of a chunk: file sample k was captured at t0 + k * period.
+
+    Fitted from the .ts sidecar (device clock against the host clock, and
+    file samples against device frames), so it includes the drift of the
+    sound card clock. The same model is logged per chunk in {name}_drift.csv.
+
+    Returns:
+        (float, float): t0 in epoch seconds and the seconds per file sample.
+    """
+    ts = read_audio_timestamps(path)
+    ts = ts[ts["monotonic"] > 0]  # writes without a callback record
+    if len(ts) < 2:
+        raise ValueError(f"Not enough timing records to fit a model: {path}")
+
+    # host time of a device frame, and device frame of a file sample
+    f0 = float(ts["cb_frame"][0])
+    s0 = float(ts["sample"][0])
+    per_frame, t_at_f0 = np.polyfit(ts["cb_frame"] - f0, ts["monotonic"], 1)
+    t_at_f0 += np.median(ts["time"] - ts["monotonic"])  # monotonic -> epoch
+    frames_per_sample, f_at_s0 = np.polyfit(ts["sample"] - s0, ts["frame"], 1)
+
+    period = per_frame * frames_per_sample
+    t0 = t_at_f0 + per_frame * (f_at_s0 - f0) - period * s0
+    return t0, period
@@ -0,0 +1,291 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+import types
+
+import numpy as np
+import scipy.signal as sps
+
+from microphone import Mic, MicInput, formatted_time
+from resampler import StreamingResampler
+from ringbuffer import DROPPED, OVERRUNS, RingBuffer
+
+######################################################################
+# Micro-benchmarks for the audio DSP in microphone.py.
+# Runs without audio hardware:  python bench_audio.py
+#
+# Soak test: drives Mic.callback and Mic.save_recording in one process
+# with a synthetic signal, as fast as the DSP allows, and writes real
+# chunk files to a temporary directory:
+#   python bench_audio.py --soak 4        (4 hours of simulated audio)
+# Callback and save_recording take turns in one thread, so the ring
+# buffer itself never fills. Overruns are modelled against a virtual
+# real-time clock instead: while a save runs, the callback would keep
+# writing, so a save longer than the ring capacity minus the flush
+# interval drops blocks. Those are added to the ring's overrun counters
+# and show up in the per-chunk lines and the summary.
+######################################################################
+
+
+def scramble_reference(mic, x, orders):
+    """The original per-frame loop of Mic.save_recording, kept as a reference.
+
+    Uses the given frame orders (n_groups x frames_per_group) instead of
+    drawing new permutations, so outputs can be compared exactly.
+    """
+    frame_len, xfade, group_frames = mic._frame_len, mic._xfade_len, mic._frames_per_group
+    n_groups = x.size // (frame_len * group_frames)
+    frames = x[: n_groups * group_frames * frame_len].reshape(n_groups, group_frames, frame_len)
+
+    fade_in = np.linspace(0.0, 1.0, xfade, dtype=np.float32)
+    fade_out = fade_in[::-1]
+
+    out_chunks = []
+    prev_tail = None
+    for g in range(n_groups):
+        for fidx in orders[g]:
+            frm = frames[g, fidx, :]
+            if prev_tail is None:
+                out_chunks.append(frm.astype(np.float32, copy=False))
+            else:
+                xfd = prev_tail[-xfade:] * fade_out + frm[:xfade] * fade_in
+                out_chunks[-1] = np.concatenate([out_chunks[-1][:-xfade], xfd], axis=0)
+                out_chunks.append(frm[xfade:].astype(np.float32, copy=False))
+            prev_tail = out_chunks[-1]
+
+    return np.concatenate(out_chunks, axis=0)
+
+
+def bench_scramble(seconds_per_call=0.5, calls=200, sampling_rate=48000):
+    mic = Mic(sampling_rate=sampling_rate)
+    mic._frame_len = max(160, int(0.040 * sampling_rate))
+    n = int(seconds_per_call * sampling_rate)
+    group = mic._frame_len * mic._frames_per_group
+    n -= n % group  # whole groups only, so no leftover is carried between calls
+    blocks = [np.random.uniform(-1, 1, n).astype(np.float32) for _ in range(calls)]
+
+    # Same permutations for both implementations; best of a few repeats
+    t_new = t_ref = float("inf")
+    for _ in range(5):
+        mic._rng = np.random.default_rng(0)
+        inp = MicInput()
+        t0 = time.perf_counter()
+        new = [mic._scramble(x, inp) for x in blocks]
+        t_new = min(t_new, time.perf_counter() - t0)
+
+        rng = np.random.default_rng(0)
+        t0 = time.perf_counter()
+        ref = [
+            scramble_reference(mic, x, np.argsort(rng.random((n // group, mic._frames_per_group)), axis=1))
+            for x in blocks
+        ]
+        t_ref = min(t_ref, time.perf_counter() - t0)
+
+    identical = all(np.array_equal(a, b) for a, b in zip(new, ref))
+    audio = calls * n / sampling_rate
+    print(f"scramble, {seconds_per_call:.1f} s blocks x {calls}: "
+          f"loop {t_ref * 1e3:.1f} ms, vectorized {t_new * 1e3:.1f} ms "
+          f"({t_ref / t_new:.1f}x, {audio / t_new:.0f}x realtime), identical output: {identical}")
+
+
+def bench_resample(seconds_per_call=0.5, calls=200, sampling_rate=48000, final_rate=8000):
+    n = int(seconds_per_call * sampling_rate)
+    x = np.random.uniform(-1, 1, n * calls).astype(np.float32)
+    blocks = x.reshape(calls, n)
+    down = sampling_rate // final_rate
+
+    t0 = time.perf_counter()
+    for b in blocks:
+        sps.resample_poly(b, 1, down)
+    t_block = time.perf_counter() - t0
+
+    r = StreamingResampler(1, down)
+    t0 = time.perf_counter()
+    out = [r.process(b) for b in blocks]
+    t_stream = time.perf_counter() - t0
+    out.append(r.flush())
+
+    exact = np.array_equal(np.concatenate(out), sps.resample_poly(x, 1, down))
+    print(f"resample {sampling_rate} -> {final_rate}, {seconds_per_call:.1f} s blocks x {calls}: "
+          f"per-block resample_poly {t_block * 1e3:.1f} ms, streaming {t_stream * 1e3:.1f} ms "
+          f"({t_block / t_stream:.1f}x), equal to whole-signal resample_poly: {exact}")
+
+
+class SyntheticSignal:
+    """Endless test input: a slowly swept tone, background noise and
+    speech-like bursts (harmonic complex with a moving pitch, 0.2-2 s on/off)."""
+
+    def __init__(self, sampling_rate=48000, channels=2, seed=0):
+        self.fs = sampling_rate
+        self.channels = channels
+        self.rng = np.random.default_rng(seed)
+        self.n = 0
+        self.tone_phase = 0.0
+        self.voice_phase = 0.0
+        self.burst_left = 0          # samples left in the current burst / pause
+        self.talking = False
+        self.f0 = 150.0
+
+    def read(self, frames):
+        t = (self.n + np.arange(frames)) / self.fs
+        self.n += frames
+
+        # Tone swept between 200 and 2000 Hz once a minute
+        freq = 1100 + 900 * np.sin(2 * np.pi * t / 60)
+        phase = self.tone_phase + 2 * np.pi * np.cumsum(freq) / self.fs
+        self.tone_phase = phase[-1] % (2 * np.pi)
+        x = 0.05 * np.sin(phase)
+
+        x += 0.01 * self.rng.standard_normal(frames)
+
+        # Speech-like bursts
+        if self.burst_left <= 0:
+            self.talking = not self.talking
+            self.burst_left = int(self.rng.uniform(0.2, 2.0) * self.fs)
+            self.f0 = self.rng.uniform(100, 250)
+        self.burst_left -= frames
+        if self.talking:
+            f0 = self.f0 * (1 + 0.1 * np.sin(2 * np.pi * 3 * t))
+            vphase = self.voice_phase + 2 * np.pi * np.cumsum(f0) / self.fs
+            self.voice_phase = vphase[-1] % (2 * np.pi)
+            x += sum(0.2 / k * np.sin(k * vphase) for k in range(1, 12))
+
+        return np.repeat(x[:, None], self.channels, axis=1).astype(np.float32)
+
+
+class SeamMeter:
+    """Compares the sample jumps where one save_recording write meets the
+    next (also across chunk files) with jumps at random positions inside
+    the writes, one of each per write.
+
+    A ratio near 1 means the joins are inaudible; clicks show up as >> 1.
+    """
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.last = None
+        self.seams = []
+        self.inner = []
+
+    def add(self, pcm16):
+        y = pcm16.astype(np.float64)
+        if y.size < 2:
+            return
+        if self.last is not None:
+            self.seams.append(abs(y[0] - self.last))
+        i = self.rng.integers(1, y.size)
+        self.inner.append(abs(y[i] - y[i - 1]))
+        self.last = y[-1]
+
+    def score(self):
+        """(mean, 99th percentile) of seam jumps relative to inner jumps."""
+        if not self.seams:
+            return 0.0, 0.0
+        seams, inner = np.asarray(self.seams), np.asarray(self.inner)
+        mean = seams.mean() / max(inner.mean(), 1e-9)
+        p99 = np.percentile(seams, 99) / max(np.percentile(inner, 99), 1e-9)
+        return mean, p99
+
+
+def soak(hours=1.0, block=512, chunk_seconds=1800, file_format="wav", sampling_rate=48000, channels=2):
+    """Runs `hours` of synthetic audio through the capture + DSP path of Mic."""
+    mic = Mic(sampling_rate=sampling_rate, n_channels=channels, file_format=file_format)
+    inp = mic.inputs[0]
+    inp.ring = RingBuffer(int(mic.buffer_seconds * sampling_rate), channels)
+    inp.times = RingBuffer(int(mic.buffer_seconds * 1000), 3, np.float64)
+
+    seams = SeamMeter()
+    write_chunk = mic._write_chunk
+
+    def metered_write(inp, pcm16):
+        seams.add(pcm16)
+        write_chunk(inp, pcm16)
+
+    mic._write_chunk = metered_write
+
+    def timed_save(final=False):
+        # In real time the callback fills the ring for the flush interval
+        # plus the duration of the save before the next read empties it
+        t0 = time.perf_counter()
+        mic.save_recording(final=final)
+        lost = int((mic.small_flush + time.perf_counter() - t0) * sampling_rate) - inp.ring.capacity
+        if lost > 0:
+            inp.ring.counters[OVERRUNS] += -(-lost // block)
+            inp.ring.counters[DROPPED] += lost
+
+    signal = SyntheticSignal(sampling_rate, channels)
+    total = int(hours * 3600 * sampling_rate)
+    per_flush = int(mic.small_flush * sampling_rate)
+    per_chunk = int(chunk_seconds * sampling_rate)
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mic.save_directory = tmp
+        mic.name = "soak"
+        mic.current_stamp = formatted_time()
+        mic.chunk_nr = 0
+        mic._start_chunk()
+
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        slowest = 0.0
+        n = next_flush = 0
+        next_chunk = per_chunk
+        next_report = 3600 * sampling_rate
+        while n < total:
+            x = signal.read(block)
+            mic.callback(inp, x, block, types.SimpleNamespace(inputBufferAdcTime=n / sampling_rate), None)
+            n += block
+
+            if n >= next_flush + per_flush:
+                timed_save()
+                next_flush += per_flush
+            if n >= next_chunk:
+                timed_save()
+                slowest = max(slowest, mic._max_save_time)
+                mic._end_chunk()
+                mic.chunk_nr += 1
+                mic.current_stamp = formatted_time()
+                mic._start_chunk()
+                next_chunk += per_chunk
+            if n >= next_report:
+                print(f"  {n / sampling_rate / 3600:.1f} h simulated, "
+                      f"{(time.process_time() - cpu0) / (n / sampling_rate) * 1e3:.2f} ms CPU per audio second")
+                next_report += 3600 * sampling_rate
+
+        timed_save(final=True)
+        slowest = max(slowest, mic._max_save_time)
+        mic._end_chunk()
+        cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+        disk = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+
+    audio = n / sampling_rate
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    seam_mean, seam_p99 = seams.score()
+    print(f"soak, {audio / 3600:.2f} h of {channels} ch {sampling_rate} Hz audio in {block}-frame blocks, {file_format}:")
+    print(f"  {cpu / audio * 1e3:.2f} ms CPU per audio second ({audio / wall:.0f}x realtime)")
+    print(f"  peak RSS {rss_peak / 1024:.0f} MB (+{(rss_peak - rss_start) / 1024:.0f} MB during the run), "
+          f"{disk / 2**20:.1f} MB written")
+    print(f"  {inp.ring.overruns} modelled ring buffer overruns ({inp.ring.dropped} frames), "
+          f"slowest save_recording {slowest * 1e3:.1f} ms")
+    print(f"  seam score {seam_mean:.2f} (mean), {seam_p99:.2f} (99th percentile); "
+          f"jumps at write joins vs inside the writes, ~1 is clean")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audio DSP micro-benchmarks and soak test")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--soak", type=float, metavar="HOURS", help="Run the soak test for this many hours of simulated audio")
+    parser.add_argument("--block", type=int, default=512, help="Callback block size in frames (soak test)")
+    parser.add_argument("--chunk", type=float, default=1800, help="Chunk length in seconds of audio (soak test)")
+    parser.add_argument("--format", default="wav", choices=["wav", "flac", "opus"], help="Output format (soak test)")
+    args = parser.parse_args()
+
+    if args.soak:
+        soak(hours=args.soak, block=args.block, chunk_seconds=args.chunk, file_format=args.format)
+        raise SystemExit
+
+    for secs in (0.5, 2.0, 10.0):  # 0.5 s = one save_recording call
+        bench_scramble(seconds_per_call=secs, calls=args.calls)
+    bench_resample(calls=args.calls)
@@ -72,6 +72,8 @@ class CaptureData:
             n_channels=self.hw_config["audio"]["n_channels"],
             chunk_length=self.hw_config["audio"]["chunk_length"],
             save_directory=f"data/{default_username}/audio",
+            file_format=self.hw_config["audio"].get("format", "wav"),
+            devices=self.hw_config["audio"].get("devices"),
         )
 
         # self.rgb = RGBCamera(
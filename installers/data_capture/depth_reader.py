@@ -0,0 +1,311 @@
+import bisect
+import glob
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import h5py
+import numpy as np
+
+######################################################################
+# Random access over a directory of depth .h5 chunks (see realsense.py).
+#
+#   reader = DepthReader("data/user1/realsense/depth")
+#   window = reader.slice_time("2024-09-20$08-50-00-000000",
+#                              "2024-09-20$08-50-05-000000")
+#   frames = window.read()            # only the needed blocks are decoded
+#   for t, frame in window: ...
+#
+# Timestamps of all chunks are kept in a small index file in the
+# directory, so opening a reader does not touch the depth datasets.
+######################################################################
+
+TIME_FORMAT = "%Y-%m-%d$%H-%M-%S-%f"
+INDEX_FILENAME = ".depth_index.npz"
+
+
+def to_seconds(t):
+    """Converts a timestamp string, datetime or float (epoch seconds) to epoch seconds."""
+    if isinstance(t, bytes):
+        t = t.decode("utf-8")
+    if isinstance(t, str):
+        t = datetime.strptime(t, TIME_FORMAT)
+    if isinstance(t, datetime):
+        return t.timestamp()
+    return float(t)
+
+
+class DepthSlice:
+    """Lazy range of frames of a DepthReader. Nothing is read until accessed."""
+
+    def __init__(self, reader, start, stop):
+        self.reader = reader
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return max(0, self.stop - self.start)
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self.reader.times[i], self.reader.frame(i)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise ValueError("DepthSlice only supports contiguous slices")
+            return DepthSlice(self.reader, self.start + start, self.start + stop)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("DepthSlice index out of range")
+        return self.reader.frame(self.start + idx)
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.read()
+        return arr if dtype is None else arr.astype(dtype)
+
+    @property
+    def timestamps(self):
+        return self.reader.times[self.start : self.stop]
+
+    def read(self):
+        """Returns all frames of the slice as one array."""
+        return self.reader.read(self.start, self.stop)
+
+
+class DepthReader:
+    """Random-access reader over a directory (or list) of depth .h5 chunks.
+
+    Frames are addressed by a global index across all chunks (ordered by
+    time) or by timestamp. Reads go through a small LRU cache of decoded
+    blocks, where a block is one HDF5 chunk along the time axis.
+
+    With persist_index=False the directory index is read but never
+    written (for many readers opened in parallel on the same directory).
+    """
+
+    def __init__(self, path, pattern="*.h5", cache_blocks=8, default_block=16, persist_index=True):
+        if isinstance(path, (list, tuple)):
+            files = list(path)
+            self.directory = os.path.dirname(files[0]) if files else "."
+        elif os.path.isfile(path):
+            files = [path]
+            self.directory = os.path.dirname(path) or "."
+        else:
+            files = glob.glob(os.path.join(path, pattern))
+            self.directory = path
+
+        self.cache_blocks = cache_blocks
+        self.default_block = default_block
+        self.persist_index = persist_index
+        self._cache = OrderedDict()  # (file index, block index) -> array
+        self._handles = {}
+
+        self._build_index(sorted(files))
+
+    # ------------------------------------------------------------------ #
+    #  Index                                                             #
+    # ------------------------------------------------------------------ #
+    def _build_index(self, files):
+        """Loads per-file timestamps, reusing the cached index where files are unchanged."""
+        index_path = os.path.join(self.directory, INDEX_FILENAME)
+        cached = {}
+        if os.path.exists(index_path):
+            try:
+                with np.load(index_path, allow_pickle=False) as idx:
+                    for key in idx.files:
+                        cached[key] = idx[key]
+            except Exception:
+                cached = {}
+
+        entries = []
+        dirty = False
+        for f in files:
+            st = os.stat(f)
+            key = os.path.basename(f)
+            stamp = np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+            times = None
+            if key in cached and f"{key}:stat" in cached and np.array_equal(cached[f"{key}:stat"], stamp):
+                times = cached[key]
+            else:
+                try:
+                    with h5py.File(f, "r") as hf:
+                        times = np.array([to_seconds(t) for t in hf["timestamps"][()]], dtype=np.float64)
+                except Exception as e:
+                    print(f"Skipping unreadable depth chunk {f}: {e}")
+                    continue
+                cached[key] = times
+                cached[f"{key}:stat"] = stamp
+                dirty = True
+
+            if len(times) > 0:
+                entries.append((times[0], f, times))
+
+        if dirty and self.persist_index:
+            try:
+                tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+                np.savez(tmp_path, **cached)
+                os.replace(tmp_path, index_path)
+            except OSError:
+                pass  # read-only archive; index is just not persisted
+
+        entries.sort(key=lambda e: e[0])
+        self.files = [f for _, f, _ in entries]
+        self.times = np.concatenate([t for _, _, t in entries]) if entries else np.zeros(0)
+        self._offsets = [0]
+        for _, _, t in entries:
+            self._offsets.append(self._offsets[-1] + len(t))
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def _locate(self, idx):
+        """Maps a global frame index to (file index, local index)."""
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("DepthReader index out of range")
+        f = bisect.bisect_right(self._offsets, idx) - 1
+        return f, idx - self._offsets[f]
+
+    def index_at(self, t):
+        """Index of the first frame at or after time t."""
+        return int(np.searchsorted(self.times, to_seconds(t), side="left"))
+
+    def nearest(self, t):
+        """Index of the frame closest to time t."""
+        t = to_seconds(t)
+        i = int(np.searchsorted(self.times, t))
+        if i == 0 or len(self) == 0:
+            return 0
+        if i >= len(self):
+            return len(self) - 1
+        return i if self.times[i] - t < t - self.times[i - 1] else i - 1
+
+    # ------------------------------------------------------------------ #
+    #  Block cache                                                       #
+    # ------------------------------------------------------------------ #
+    def _dataset(self, f, name="depth"):
+        if f not in self._handles:
+            self._handles[f] = h5py.File(self.files[f], "r")
+        return self._handles[f][name]
+
+    def _block_size(self, f):
+        ds = self._dataset(f)
+        return ds.chunks[0] if ds.chunks else self.default_block
+
+    def _block(self, f, b):
+        key = (f, b)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        ds = self._dataset(f)
+        size = self._block_size(f)
+        data = ds[b * size : min((b + 1) * size, ds.shape[0])]
+
+        self._cache[key] = data
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return data
+
+    # ------------------------------------------------------------------ #
+    #  Access                                                            #
+    # ------------------------------------------------------------------ #
+    def frame(self, idx):
+        f, i = self._locate(idx)
+        size = self._block_size(f)
+        return self._block(f, i // size)[i % size]
+
+    def read(self, start, stop):
+        """Reads frames [start, stop) into one array, decoding only the blocks they touch."""
+        start = max(0, start)
+        stop = min(len(self), stop)
+        if stop <= start:
+            return np.zeros((0,), dtype=np.float16)
+
+        parts = []
+        idx = start
+        while idx < stop:
+            f, i = self._locate(idx)
+            size = self._block_size(f)
+            b = i // size
+            block = self._block(f, b)
+            lo = i - b * size
+            hi = min(len(block), lo + (stop - idx))
+            parts.append(block[lo:hi])
+            idx += hi - lo
+        return np.concatenate(parts, axis=0)
+
+    def offsets(self, start, stop):
+        """Crop offsets (x, y) for frames [start, stop); zeros for uncropped chunks."""
+        start = max(0, start)
+        stop = min(len(self), stop)
+        out = np.zeros((max(0, stop - start), 2), dtype=np.int16)
+
+        idx = start
+        while idx < stop:
+            f, i = self._locate(idx)
+            n = min(stop - idx, self._offsets[f + 1] - self._offsets[f] - i)
+            self._dataset(f)  # makes sure the file is open
+            if "offsets" in self._handles[f]:
+                out[idx - start : idx - start + n] = self._handles[f]["offsets"][i : i + n]
+            idx += n
+        return out
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise ValueError("DepthReader only supports contiguous slices")
+            return DepthSlice(self, start, stop)
+        return self.frame(idx)
+
+    def slice_time(self, start, end):
+        """Lazy slice of all frames with start <= t < end."""
+        return DepthSlice(self, self.index_at(start), self.index_at(end))
+
+    def frame_at(self, t):
+        """Frame closest to time t."""
+        return self.frame(self.nearest(t))
+
+    def iter_frames(self, start=None, end=None):
+        """Yields (timestamp, frame) pairs, optionally restricted to [start, end)."""
+        lo = 0 if start is None else self.index_at(start)
+        hi = len(self) if end is None else self.index_at(end)
+        return iter(DepthSlice(self, lo, hi))
+
+    def __iter__(self):
+        return self.iter_frames()
+
+    def close(self):
+        for hf in self._handles.values():
+            try:
+                hf.close()
+            except Exception:
+                pass
+        self._handles = {}
+        self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect a directory of depth .h5 chunks")
+    parser.add_argument("path", help="Directory with depth chunks or a single .h5 file")
+    args = parser.parse_args()
+
+    with DepthReader(args.path) as reader:
+        print(f"{len(reader.files)} chunks, {len(reader)} frames")
+        if len(reader):
+            print(f"First frame: {datetime.fromtimestamp(reader.times[0]).strftime(TIME_FORMAT)}")
+            print(f"Last frame:  {datetime.fromtimestamp(reader.times[-1]).strftime(TIME_FORMAT)}")
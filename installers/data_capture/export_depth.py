@@ -0,0 +1,177 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import h5py
+import numpy as np
+
+from depth_reader import DepthReader
+
+######################################################################
+# Bulk export of depth .h5 chunks (see realsense.py) to
+#   png16 - one 16-bit PNG per frame in <chunk>/
+#   npy   - one (frames, h, w) uint16 .npy per chunk, np.load(mmap_mode="r")
+#   video - colorized preview .mp4 per chunk
+#
+# All formats use one global scale: stored values are converted back to
+# raw z16 units (value * 65535), the preview uses a fixed --max-depth.
+# Every chunk also gets <chunk>_frames.csv (index, timestamp, crop offsets).
+# Finished outputs are skipped on the next run, so an interrupted export of
+# a multi-day archive can simply be restarted.
+#
+#   python export_depth.py data/ exports/ --format npy --jobs 8
+######################################################################
+
+Z16_SCALE = 65535.0
+
+
+def to_z16(frames):
+    return np.clip(np.rint(frames.astype(np.float32) * Z16_SCALE), 0, Z16_SCALE).astype(np.uint16)
+
+
+def colorize(z16, max_depth):
+    return cv2.applyColorMap(cv2.convertScaleAbs(z16, alpha=255.0 / max_depth), cv2.COLORMAP_JET)
+
+
+def output_path(h5_path, input_root, output_root, fmt):
+    rel = os.path.relpath(os.path.splitext(h5_path)[0], input_root)
+    base = os.path.join(output_root, rel)
+    if fmt == "npy":
+        return base + ".npy"
+    if fmt == "video":
+        return base + ".mp4"
+    return base  # png16: one directory per chunk
+
+
+def read_timestamps(h5_path):
+    """Original timestamp strings of a chunk (used for file names, no float round trip)."""
+    with h5py.File(h5_path, "r") as hf:
+        return [t.decode("utf-8") for t in hf["timestamps"][()]]
+
+
+def write_frame_table(path, reader, stamps):
+    offsets = reader.offsets(0, len(reader))
+    with open(path, "w") as f:
+        f.write("index,timestamp,x,y\n")
+        for i, ts in enumerate(stamps):
+            f.write(f"{i},{ts},{offsets[i, 0]},{offsets[i, 1]}\n")
+
+
+def iter_blocks(reader, block=64):
+    for start in range(0, len(reader), block):
+        yield start, reader.read(start, start + block)
+
+
+def export_chunk(job):
+    """Exports one .h5 chunk. Runs in a worker process.
+
+    Returns (h5 path, number of frames, seconds, status).
+    """
+    h5_path, out_path, fmt, max_depth, fps = job
+    start_time = time.time()
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".partial" + (os.path.splitext(out_path)[1] if fmt != "png16" else "")
+
+    try:
+        # The parent already indexed the directory; workers must not rewrite it concurrently
+        with DepthReader(h5_path, persist_index=False) as reader:
+            n = len(reader)
+            if n == 0:
+                return h5_path, 0, 0.0, "empty"
+            h, w = reader.frame(0).shape[:2]
+            stamps = read_timestamps(h5_path)
+
+            if fmt == "npy":
+                arr = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint16, shape=(n, h, w))
+                for start, frames in iter_blocks(reader):
+                    arr[start : start + len(frames)] = to_z16(frames)
+                arr.flush()
+                del arr
+
+            elif fmt == "png16":
+                if os.path.exists(tmp_path):
+                    shutil.rmtree(tmp_path)
+                os.makedirs(tmp_path)
+                for start, frames in iter_blocks(reader):
+                    for i, frame in enumerate(to_z16(frames)):
+                        cv2.imwrite(os.path.join(tmp_path, f"depth_{stamps[start + i]}.png"), frame)
+
+            else:
+                out = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+                if not out.isOpened():
+                    raise RuntimeError(f"Failed to open VideoWriter: {tmp_path}")
+                for _, frames in iter_blocks(reader):
+                    for frame in to_z16(frames):
+                        out.write(colorize(frame, max_depth))
+                out.release()
+
+            write_frame_table(os.path.splitext(out_path)[0] + "_frames.csv", reader, stamps)
+
+        # Output only appears under its final name once complete (resume marker)
+        if os.path.isdir(out_path):
+            shutil.rmtree(out_path)  # --overwrite of a png16 export
+        os.replace(tmp_path, out_path)
+        return h5_path, n, time.time() - start_time, "ok"
+
+    except Exception as e:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return h5_path, 0, time.time() - start_time, f"error: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export depth .h5 chunks to 16-bit PNG, .npy or preview video")
+    parser.add_argument("input", help="Directory searched recursively for depth .h5 chunks")
+    parser.add_argument("output", help="Output directory (mirrors the input layout)")
+    parser.add_argument("--format", choices=["png16", "npy", "video"], default="npy")
+    parser.add_argument("--jobs", "-j", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--max-depth", type=float, default=8500.0, help="z16 value mapped to the end of the colormap (video only)")
+    parser.add_argument("--fps", type=float, default=10.0, help="Frame rate of the preview video")
+    parser.add_argument("--overwrite", action="store_true", help="Re-export chunks that already have an output")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.input, "**", "*.h5"), recursive=True))
+    jobs = []
+    skipped = 0
+    for f in files:
+        out = output_path(f, args.input, args.output, args.format)
+        if os.path.exists(out) and not args.overwrite:
+            skipped += 1
+            continue
+        jobs.append((f, out, args.format, args.max_depth, args.fps))
+
+    print(f"Found {len(files)} chunks, {skipped} already exported, {len(jobs)} to do")
+    if not jobs:
+        return
+
+    # Index every chunk directory once here instead of racing in the workers
+    for directory in sorted({os.path.dirname(job[0]) for job in jobs}):
+        DepthReader(directory).close()
+
+    start_time = time.time()
+    total_frames = 0
+    errors = 0
+    with multiprocessing.Pool(max(1, args.jobs)) as pool:
+        for k, (path, n, secs, status) in enumerate(pool.imap_unordered(export_chunk, jobs), 1):
+            total_frames += n
+            if status.startswith("error"):
+                errors += 1
+            elapsed = time.time() - start_time
+            eta = elapsed / k * (len(jobs) - k)
+            print(f"[{k}/{len(jobs)}] {os.path.basename(path)}: {n} frames in {secs:.1f}s ({status}) | ETA {eta / 60:.1f} min")
+            sys.stdout.flush()
+
+    elapsed = time.time() - start_time
+    print(f"Exported {total_frames} frames from {len(jobs) - errors} chunks in {elapsed:.1f}s ({errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
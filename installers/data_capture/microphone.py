@@ -1,13 +1,22 @@
+import contextlib
 import os
 import time as pytime
 import multiprocessing
+from functools import partial
 from datetime import datetime
 import wave  # NEW
 
 import numpy as np
 import sounddevice as sd
+try:
+    import soundfile as sf  # only needed for the "flac" / "opus" output formats
+except ImportError:
+    sf = None
+from audio_features import AudioFeatures
+from audio_reader import TIMING_DTYPE
+from ringbuffer import RingBuffer
+from resampler import StreamingResampler
 from scipy.io.wavfile import write  # still used nowhere now; can keep or remove
-import scipy.signal as sps
 
 # Installs for linux: sudo apt install pipewire wireplumber pipewire-audio-client-libraries libpulse-dev libportaudio2 libportaudiocpp0
 
@@ -15,6 +24,88 @@ def formatted_time():
     return "{:%Y-%m-%d$%H-%M-%S-%f}".format(datetime.now())
 
 
+# Output formats: file extension and libsndfile (format, subtype); "wav" uses the wave module
+AUDIO_FORMATS = {
+    "wav": ("wav", None),
+    "flac": ("flac", ("FLAC", "PCM_16")),   # lossless
+    "opus": ("opus", ("OGG", "OPUS")),      # lossy; needs libsndfile >= 1.0.29
+}
+
+
+class LinearFit:
+    """Running least-squares line y = a + b * x (O(1) memory, x relative to the first point)."""
+
+    def __init__(self):
+        self.x0 = None
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def add(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if x.size == 0:
+            return
+        if self.x0 is None:
+            self.x0 = float(x[0])
+        x = x - self.x0
+        self.n += x.size
+        self.sx += x.sum()
+        self.sy += y.sum()
+        self.sxx += (x * x).sum()
+        self.sxy += (x * y).sum()
+
+    def slope(self):
+        if self.n < 2:
+            return None
+        den = self.sxx - self.sx * self.sx / self.n
+        if den <= 0:
+            return None
+        return (self.sxy - self.sx * self.sy / self.n) / den
+
+    def __call__(self, x):
+        """Value of the line at x."""
+        b = self.slope()
+        return (self.sy - b * self.sx) / self.n + b * (x - self.x0)
+
+
+class MicInput:
+    """One input device of a Mic: stream settings, shared-memory buffers and DSP state."""
+
+    def __init__(self, label=None, match=None, n_channels=2):
+        self.label          = label       # goes into the file names; None for the single default device
+        self.match          = match       # part of the PortAudio device name; None = default device
+        self.n_channels     = n_channels
+        self.device         = None        # PortAudio device index, resolved in record()
+
+        # Shared between the capture process and the DSP worker
+        self.ring           = None        # RingBuffer of samples
+        self.times          = None        # RingBuffer, per callback block: first frame index, inputBufferAdcTime, time.monotonic()
+        self._stamp         = np.zeros((1, 3))
+
+        # Capture process only
+        self.overflow_count = 0
+        self.last_status    = ""
+
+        # DSP worker only
+        self.wf             = None        # current chunk file
+        self.feat_file      = None        # .feat sidecar of the current chunk
+        self.scramble_buf   = np.zeros(0, dtype=np.float32)  # leftover samples between calls
+        self.resampler      = None        # StreamingResampler, designed on first use
+        self.features       = None        # AudioFeatures, computed before scrambling
+        self.peak_slow      = None        # for smoothed gain (no pops)
+        self.gain           = 0.3
+        self.ts_file        = None        # .ts timing sidecar of the current chunk
+        self.file_samples   = 0           # samples written to the current chunk file
+        self.clock_fit      = None        # LinearFit, host monotonic time of a device frame (this chunk)
+        self.sample_fit     = None        # LinearFit, device frame of a file sample (this chunk)
+        self.scr_anchors    = []          # (scrambled start, device frame start, length, frames) of recent writes
+        self.scr_out        = 0           # scrambled samples produced so far
+        self.in_used        = 0           # device frames that went into them
+        self.frames_before  = 0           # in_used when the current chunk started
+        self.high_water     = 0
+        self.overruns_before = 0
+
+
 class Mic:
     def __init__(
         self,
@@ -24,7 +115,24 @@ class Mic:
         final_channels=1,             # file/output channels (mono)
         save_directory="data/audio",
         chunk_length=None,
+        buffer_seconds=10.0,          # capacity of the callback -> writer ring buffer
+        file_format="wav",            # "wav", "flac" or "opus", see AUDIO_FORMATS
+        devices=None,                 # list of {"name", "match", "n_channels"}, see below
     ):
+        """
+        By default records the Brio mic (or the default input device). With
+        `devices` several inputs are recorded at once, e.g.
+
+            [{"name": "brio", "match": "brio"}, {"name": "desk", "match": "USB Audio", "n_channels": 1}]
+
+        "match" is looked up in the PortAudio device names, "name" goes into
+        the file names ({name}_{device}_chunk{n}_{time}.wav). All inputs share
+        the sampling rate, one DSP worker and one rotation schedule; the clock
+        drift between them is logged to {name}_drift.csv at every rotation.
+        """
+        if file_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown audio format {file_format!r}, use one of {list(AUDIO_FORMATS)}")
+
         print(f"Initialized mic with default rate {sampling_rate}")
         
         self.sampling_rate  = sampling_rate
@@ -33,45 +141,54 @@ class Mic:
         self.final_rate     = final_rate
         self.save_directory = save_directory
         self.chunk_length   = chunk_length
-        self.recording      = []
+        self.buffer_seconds = buffer_seconds
+        self.file_format    = file_format
+        self._stop_event    = None    # multiprocessing.Event ending the record loop and the DSP worker
+        self._max_save_time = 0.0     # slowest save_recording of the current chunk
+
+        if devices:
+            self.inputs = [
+                MicInput(d.get("name"), d.get("match"), d.get("n_channels", n_channels)) for d in devices
+            ]
+        else:
+            self.inputs = [MicInput(n_channels=n_channels)]
         self.is_recording   = False
         self.chunk_nr       = 0
         self.current_stamp  = None
 
         # NEW: streaming writer + small periodic flush
-        self.wf = None
         self.small_flush = 0.5  # seconds between appends
 
-        # optional: track overflow without printing in callback
-        self.overflow_count = 0
-        self.last_status = ""
-        
         self._blur_b = None        # FIR coeffs for temporal blur
         self._blur_zi1 = self._blur_zi2 = self._blur_zi3 = None  # lfilter states
-        self._peak_slow = None     # running peak estimate
-        self._gain = 1.0           # smoothed output gain
-        
-        self._scramble_buf = np.zeros(0, dtype=np.float32)  # leftover samples between calls
+
         self._frame_len = None
         self._frames_per_group = 10   # ~240 ms if frame_len ~40 ms
         self._xfade_len = 20
-        self._peak_slow = None       # for smoothed gain (no pops)
-        self._gain = 0.3
+        self._rng = np.random.default_rng()
 
 
     # ------------------------------------------------------------------ #
     #  Callback                                                          #
     # ------------------------------------------------------------------ #
-    def callback(self, indata, frames, time, status):
+    def callback(self, inp, indata, frames, time, status):
+        """Stream callback of one input (bound with functools.partial)."""
+        now = pytime.monotonic()
         # Avoid prints in realtime thread (can cause overflows)
         if status:
             try:
                 if hasattr(status, "input_overflow") and status.input_overflow:
-                    self.overflow_count += 1
+                    inp.overflow_count += 1
             except Exception:
                 pass
-            self.last_status = str(status)
-        self.recording.append(indata.copy())
+            inp.last_status = str(status)
+        # Only a copy into shared memory; a full buffer drops (and counts) the block
+        first = inp.ring.written
+        if inp.ring.write(indata):
+            inp._stamp[0, 0] = first
+            inp._stamp[0, 1] = time.inputBufferAdcTime
+            inp._stamp[0, 2] = now
+            inp.times.write(inp._stamp)
 
     # ------------------------------------------------------------------ #
     #  Device helper                                                     #
@@ -96,135 +213,287 @@ class Mic:
         print(f"No BRIO found; falling back to default input device {idx}")
         return idx
 
+    def find_sound_device(self, devs, match):
+        """Index of the first input device whose name contains `match`, None if there is none."""
+        for dev in devs:
+            if dev["max_input_channels"] > 0 and match.lower() in dev["name"].lower():
+                print(f"Using {dev['name']} (device {dev['index']}) for '{match}'")
+                return dev["index"]
+        print(f"No input device matching '{match}' found")
+        return None
+
+    def resolve_devices(self):
+        """Sets the PortAudio device of every input and drops the ones that can't be found."""
+        devs = sd.query_devices()
+        found = []
+        for inp in self.inputs:
+            if inp.match is None:
+                inp.device = self.find_default_sound_device(devs)
+
+                hostapis  = sd.query_hostapis()
+                pulse_idx = next(
+                    (i for i, api in enumerate(hostapis)
+                     if "pulse" in api["name"].lower() or "wire" in api["name"].lower()),
+                    None
+                )
+                if pulse_idx is not None:
+                    sd.default.hostapi = pulse_idx
+                    inp.device = None              # let Pulse choose default
+
+                sd.default.device = (inp.device, None) if inp.device is not None else None
+                found.append(inp)
+            else:
+                inp.device = self.find_sound_device(devs, inp.match)
+                if inp.device is not None:
+                    found.append(inp)
+        self.inputs = found
+
     # ------------------------------------------------------------------ #
-    #  Helpers to open/close the current chunk WAV                       #
+    #  Helpers to open/close/append to the current chunk file            #
     # ------------------------------------------------------------------ #
-    def _open_chunk_wav(self):
-        """Open a new WAV for the current chunk and write a valid header."""
+    def _open_chunk_file(self, inp):
+        """Open a new audio file for the current chunk and write a valid header.
+
+        WAV goes through the wave module, FLAC / Opus are stream-encoded by
+        libsndfile. All of them stay readable up to the last flushed block if
+        the process dies (see audio_reader.read_audio_chunk).
+        """
         os.makedirs(self.save_directory, exist_ok=True)
-        fname = os.path.join(
-            self.save_directory,
-            f"{self.name}_chunk{self.chunk_nr}_{self.current_stamp}.wav"
-        )
-        self.wf = wave.open(fname, "wb")
-        self.wf.setnchannels(self.final_channels)   # mono
-        self.wf.setsampwidth(2)                     # int16
-        self.wf.setframerate(self.final_rate)       # 8 kHz
-        # header is written now; file size > 0 immediately
-
-    def _close_chunk_wav(self):
-        if self.wf is not None:
+        ext, sf_format = AUDIO_FORMATS[self.file_format]
+        prefix = f"{self.name}_{inp.label}" if inp.label else self.name
+        base = os.path.join(self.save_directory, f"{prefix}_chunk{self.chunk_nr}_{self.current_stamp}")
+        fname = f"{base}.{ext}"
+        inp.feat_file = open(f"{base}.feat", "wb")   # audio_reader.FEATURE_DTYPE records
+        inp.ts_file = open(f"{base}.ts", "wb")       # audio_reader.TIMING_DTYPE records
+        inp.file_samples = 0
+        if sf_format is None:
+            inp.wf = wave.open(fname, "wb")
+            inp.wf.setnchannels(self.final_channels)   # mono
+            inp.wf.setsampwidth(2)                     # int16
+            inp.wf.setframerate(self.final_rate)       # 8 kHz
+            # header is written now; file size > 0 immediately
+        else:
+            if sf is None:
+                raise RuntimeError(f"Audio format {self.file_format!r} needs the soundfile package")
+            inp.wf = sf.SoundFile(
+                fname, "w",
+                samplerate=self.final_rate,
+                channels=self.final_channels,
+                format=sf_format[0],
+                subtype=sf_format[1],
+            )
+
+    def _write_chunk(self, inp, pcm16):
+        """Append int16 samples to the open chunk file."""
+        if isinstance(inp.wf, wave.Wave_write):
+            inp.wf.writeframes(pcm16.tobytes())   # also patches the header sizes
+        else:
+            inp.wf.write(pcm16)
+            inp.wf.flush()
+
+    def _close_chunk_file(self, inp):
+        if inp.wf is not None:
             try:
-                self.wf.close()
+                inp.wf.close()
             except Exception:
                 pass
-            self.wf = None
+            inp.wf = None
+        if inp.feat_file is not None:
+            inp.feat_file.close()
+            inp.feat_file = None
+        if inp.ts_file is not None:
+            inp.ts_file.close()
+            inp.ts_file = None
 
     # ------------------------------------------------------------------ #
-    #  Main record loop                                                  #
+    #  Main record loop (capture process)                                #
     # ------------------------------------------------------------------ #
     def record(self, termFlag, name, chunkdur, event=None):
+        """Capture process: owns the PortAudio streams and only pushes raw blocks
+        (and their timestamps) into shared-memory ring buffers. Scrambling,
+        resampling and encoding of all inputs run in one separate DSP / writer
+        process (see _dsp_worker), so a slow disk can't delay the callbacks."""
         if event is not None:
             event.wait()
 
         self.name = name
         self.is_recording = True
+        self._stop_event = multiprocessing.Event()
         print("Recording audio…")
-        
-        devs   = sd.query_devices()
-        dev_id = self.find_default_sound_device(devs)
-
-        hostapis  = sd.query_hostapis()
-        pulse_idx = next(
-            (i for i, api in enumerate(hostapis)
-             if "pulse" in api["name"].lower() or "wire" in api["name"].lower()),
-            None
-        )
-        if pulse_idx is not None:
-            sd.default.hostapi = pulse_idx
-            dev_id = None                      # let Pulse choose default
 
-        sd.default.device = (dev_id, None) if dev_id is not None else None
+        self.resolve_devices()
+        if not self.inputs:
+            print("No audio input device found, audio is not recorded.")
+            return
+
+        for inp in self.inputs:
+            inp.ring = RingBuffer.shared(int(self.buffer_seconds * self.sampling_rate), inp.n_channels)
+            inp.times = RingBuffer.shared(int(self.buffer_seconds * 1000), 3, np.float64)  # blocks of >= 1 ms
 
-        print(f"Opening stream at {self.sampling_rate} Hz, {self.n_channels} ch")
+        # Start the worker before any PortAudio stream (and its threads) exists
+        worker = multiprocessing.Process(
+            target=self._dsp_worker, args=(self.inputs, self._stop_event, chunkdur), name="audio-dsp"
+        )
+        worker.start()
 
         try:
-            with sd.InputStream(
-                    samplerate=self.sampling_rate,
-                    channels=self.n_channels,
-                    dtype='float32',
-                    device=dev_id,
-                    callback=self.callback):
-
-                # Start first chunk file
-                self.current_stamp = formatted_time()
-                self.chunk_nr = 0
-                self._open_chunk_wav()
-
-                next_small_flush = pytime.time() + self.small_flush
-                next_rotate = pytime.time() + chunkdur
-
-                while self.is_recording and termFlag.value != 1:
-                    now = pytime.time()
-
-                    # append buffered audio frequently
-                    if now >= next_small_flush:
-                        self.save_recording()        # appends to same WAV
-                        next_small_flush += self.small_flush
-
-                    # rotate file per chunk duration (like camera)
-                    if now >= next_rotate:
-                        # flush remaining, close old, open new
-                        self.save_recording()
-                        self._close_chunk_wav()
-                        self.chunk_nr += 1
-                        self.current_stamp = formatted_time()
-                        self._open_chunk_wav()
-                        next_rotate += chunkdur
+            with contextlib.ExitStack() as streams:
+                for inp in self.inputs:
+                    print(f"Opening stream at {self.sampling_rate} Hz, {inp.n_channels} ch"
+                          + (f" ({inp.label})" if inp.label else ""))
+                    streams.enter_context(sd.InputStream(
+                        samplerate=self.sampling_rate,
+                        channels=inp.n_channels,
+                        dtype='float32',
+                        device=inp.device,
+                        callback=partial(self.callback, inp)))
+
+                # Nothing to do here but wait for the stop request
+                while self.is_recording and termFlag.value != 1 and worker.is_alive():
+                    self._stop_event.wait(self.small_flush)
 
         except sd.PortAudioError as e:
             print("PortAudio error:", e)
             termFlag.value = 1
 
-        # final flush & close
-        self.save_recording()
-        self._close_chunk_wav()
+        # Let the worker drain the buffers, flush & close the last chunks
+        self._stop_event.set()
+        worker.join(timeout=30)
+        if worker.is_alive():
+            print("Audio DSP worker did not finish in time, terminating it.")
+            worker.terminate()
 
         sd.stop()
         sd._terminate()
 
+        for inp in self.inputs:
+            if inp.ring.overruns or inp.overflow_count:
+                print(f"Audio{' ' + inp.label if inp.label else ''}: {inp.ring.overruns} ring buffer overruns "
+                      f"({inp.ring.dropped} frames dropped), {inp.overflow_count} input overflows")
+            inp.ring.close(unlink=True)
+            inp.times.close(unlink=True)
+
         if termFlag.value == 1:
             print("Termination flag detected. Audio recording has been forced to end.")
         else:
             print("Audio recording stopped normally.")
 
+    def stop(self):
+        """Ask the record loop to finish (from another thread of the capture process)."""
+        self.is_recording = False
+        if self._stop_event is not None:
+            self._stop_event.set()
+
     # ------------------------------------------------------------------ #
-    #  Save helper (now appends to the open WAV)                         #
+    #  DSP / writer process                                              #
     # ------------------------------------------------------------------ #
-    def save_recording(self):
-        """
-        Time-scramble within short windows to reduce intelligibility but keep the scene feel:
-        - mono mix
-        - slice into ~40 ms frames
-        - randomize frame order within ~240 ms groups
-        - short crossfade between frames to avoid clicks
-        - smoothed output gain (no per-chunk pops)
-        - optional resample to self.final_rate
-        - append to the already-open WAV (self.wf)
+    def _dsp_worker(self, inputs, stop_event, chunkdur):
+        """Reads raw blocks from the ring buffers every small_flush seconds,
+        scrambles / resamples / encodes them and rotates the chunk files of
+        all inputs together.
+
+        Reports backpressure per chunk (ring buffer high-water mark, overruns,
+        slowest save_recording call) and the clock drift between the inputs.
         """
-        if not self.recording or self.wf is None:
-            return
+        self.inputs = inputs
+
+        # Start first chunk files
+        self.current_stamp = formatted_time()
+        self.chunk_nr = 0
+        self._start_chunk()
+
+        next_small_flush = pytime.monotonic() + self.small_flush
+        next_rotate = pytime.monotonic() + chunkdur
+
+        # Sleep until the next flush / rotation deadline or the stop request
+        while not stop_event.is_set():
+            timeout = min(next_small_flush, next_rotate) - pytime.monotonic()
+            if timeout > 0 and stop_event.wait(timeout):
+                break
+            now = pytime.monotonic()
+
+            # append buffered audio frequently
+            if now >= next_small_flush:
+                self.save_recording()        # appends to the same chunk files
+                while next_small_flush <= now:
+                    next_small_flush += self.small_flush
+
+            # rotate files per chunk duration (like camera)
+            if now >= next_rotate:
+                # flush remaining, close old, open new
+                self.save_recording()
+                self._end_chunk()
+                self.chunk_nr += 1
+                self.current_stamp = formatted_time()
+                self._start_chunk()
+                next_rotate += chunkdur
 
-        # Pull pending callback blocks and clear queue quickly
-        blocks, self.recording = self.recording, []
-        x = np.concatenate(blocks, axis=0).astype(np.float32)
-        if x.size == 0:
-            return
+        # final flush & close
+        self.save_recording(final=True)
+        self._end_chunk()
+        for inp in inputs:
+            inp.ring.close()
+            inp.times.close()
+
+    def _start_chunk(self):
+        self._max_save_time = 0.0
+        for inp in self.inputs:
+            self._open_chunk_file(inp)
+            inp.high_water = 0
+            inp.overruns_before = inp.ring.overruns
+            inp.clock_fit = LinearFit()
+            inp.frames_before = inp.in_used
+            inp.sample_fit = LinearFit()
+
+    def _end_chunk(self):
+        for inp in self.inputs:
+            self._close_chunk_file(inp)
+            print(f"Audio chunk {self.chunk_nr}{' ' + inp.label if inp.label else ''}: "
+                  f"buffer high-water {inp.high_water / inp.ring.capacity:.0%} of {self.buffer_seconds:.0f} s, "
+                  f"{inp.ring.overruns - inp.overruns_before} overruns")
+        print(f"Audio chunk {self.chunk_nr}: slowest save {self._max_save_time * 1e3:.0f} ms")
+        self._report_drift()
+
+    def _report_drift(self):
+        """Logs, per input, the sample rate over the chunk measured against
+        time.monotonic(), its drift relative to the first input and the linear
+        timing model of the chunk file: sample k was captured at t0 + k * sample_period."""
+        path = os.path.join(self.save_directory, f"{self.name}_drift.csv")
+        new_file = not os.path.exists(path)
+        epoch_offset = pytime.time() - pytime.monotonic()
+        ref_rate = None
+        with open(path, "a") as f:
+            if new_file:
+                f.write("chunk,time,device,frames,rate_hz,ppm,drift_ppm,t0,sample_period\n")
+            for inp in self.inputs:
+                sec_per_frame = inp.clock_fit.slope()
+                frames_per_sample = inp.sample_fit.slope()
+                if sec_per_frame is None or frames_per_sample is None:
+                    continue
+                rate = 1.0 / sec_per_frame
+                ppm = (rate / self.sampling_rate - 1) * 1e6
+                if ref_rate is None:
+                    ref_rate = rate
+                drift = (rate / ref_rate - 1) * 1e6
+                t0 = inp.clock_fit(inp.sample_fit(0.0)) + epoch_offset
+                period = sec_per_frame * frames_per_sample
+                f.write(f"{self.chunk_nr},{self.current_stamp},{inp.label or 'default'},"
+                        f"{inp.in_used - inp.frames_before},"
+                        f"{rate:.3f},{ppm:.1f},{drift:.1f},{t0:.6f},{period:.9e}\n")
+                if len(self.inputs) > 1:
+                    print(f"Audio chunk {self.chunk_nr} {inp.label}: {rate:.2f} Hz "
+                          f"({ppm:+.0f} ppm), drift vs {self.inputs[0].label}: {drift:+.1f} ppm")
 
-        # Stereo → mono
-        if x.ndim == 2 and x.shape[1] == 2:
-            x = x.mean(axis=1)
+    # ------------------------------------------------------------------ #
+    #  Time scrambler                                                    #
+    # ------------------------------------------------------------------ #
+    def _scramble(self, x, inp):
+        """Permute ~40 ms frames within ~240 ms groups and crossfade the joins.
 
+        Samples that don't fill a whole group are kept for the next call.
+        All groups are handled at once: one gather for the new frame order,
+        in-place fades and a single overlap-add of the crossfade regions.
+        """
         fs = int(self.sampling_rate)
 
         # --- initialize frame & xfade lengths once (40 ms frames, 5 ms crossfade)
@@ -238,85 +507,164 @@ class Mic:
         group_frames = int(self._frames_per_group)
 
         # Accumulate with leftover from previous call
-        buf = np.concatenate([self._scramble_buf, x])
-        n_full_frames = buf.size // frame_len
-        n_groups = n_full_frames // group_frames
-        n_use_frames = n_groups * group_frames
-        n_use_samples = n_use_frames * frame_len
-
-        if n_use_frames == 0:
-            # Not enough for one full group: keep as leftover for next call
-            self._scramble_buf = buf
-            return
+        buf = np.concatenate([inp.scramble_buf, x]) if inp.scramble_buf.size else x
+        n_groups = buf.size // (frame_len * group_frames)
+        n_use_samples = n_groups * group_frames * frame_len
 
-        # Reshape into groups x frames x samples
-        frames = buf[:n_use_samples].reshape(n_groups, group_frames, frame_len)
+        # Keep leftover (anything after the processed region)
+        inp.scramble_buf = buf[n_use_samples:]
+
+        if n_groups == 0:
+            # Not enough for one full group
+            return np.zeros(0, dtype=np.float32)
+
+        # Shuffle frames within each group: one gather over all groups
+        order = np.argsort(self._rng.random((n_groups, group_frames)), axis=1)
+        rows = (order + group_frames * np.arange(n_groups)[:, None]).reshape(-1)
+        frames = buf[:n_use_samples].reshape(-1, frame_len)
+
+        # Frame k starts at k * hop; its last xfade samples overlap the next frame's head.
+        # Heads are gathered straight into the output, tails separately for the overlap-add.
+        n = rows.size
+        hop = frame_len - xfade
+        y = np.empty(n * hop + xfade, dtype=np.float32)
+        body = y[: n * hop].reshape(n, hop)
+        np.take(frames[:, :hop], rows, axis=0, out=body)
+        tails = frames[rows, hop:]
 
-        # Prepare fades
         fade_in = np.linspace(0.0, 1.0, xfade, dtype=np.float32)
-        fade_out = fade_in[::-1]
-
-        out_chunks = []
-        prev_tail = None
-
-        # Process each group: permute frames and crossfade joins
-        for g in range(n_groups):
-            order = np.random.permutation(group_frames)
-            for idx, fidx in enumerate(order):
-                frm = frames[g, fidx, :]
-
-                if prev_tail is None:
-                    # first frame: just store
-                    out_chunks.append(frm.astype(np.float32, copy=False))
-                    prev_tail = out_chunks[-1]
-                else:
-                    # crossfade boundary: last xfade of previous with first xfade of current
-                    a = prev_tail[-xfade:] * fade_out
-                    b = frm[:xfade] * fade_in
-                    xfd = a + b
-
-                    # assemble: (prev without its last xfade) + xfade + (rest of current)
-                    out_chunks[-1] = np.concatenate([out_chunks[-1][:-xfade], xfd], axis=0)
-                    out_chunks.append(frm[xfade:].astype(np.float32, copy=False))
-                    prev_tail = out_chunks[-1]
-
-        y = np.concatenate(out_chunks, axis=0)
+        body[1:, :xfade] *= fade_in
+        y[n * hop :] = tails[-1]
+        y[hop : n * hop].reshape(n - 1, hop)[:, :xfade] += tails[:-1] * fade_in[::-1]
 
-        # Keep leftover (anything after the processed region)
-        self._scramble_buf = buf[n_use_samples:]
+        return y
+
+    # ------------------------------------------------------------------ #
+    #  Save helper (appends to the open chunk file)                      #
+    # ------------------------------------------------------------------ #
+    def save_recording(self, final=False):
+        """
+        Time-scramble within short windows to reduce intelligibility but keep the scene feel:
+        - mono mix
+        - acoustic features (RMS, VAD, spectral flux, overlap) of the unscrambled signal to the .feat sidecar
+        - slice into ~40 ms frames
+        - randomize frame order within ~240 ms groups
+        - short crossfade between frames to avoid clicks
+        - smoothed output gain (no per-chunk pops)
+        - optional resample to self.final_rate (streaming, no seams between calls)
+        - append to the already-open chunk files (one per input)
+
+        final=True also writes out the resampler's tail at the end of a recording.
+        """
+        t0 = pytime.perf_counter()
+        for inp in self.inputs:
+            self._save_input(inp, final)
+        self._max_save_time = max(self._max_save_time, pytime.perf_counter() - t0)
+
+    def _save_input(self, inp, final):
+        if inp.ring is None or inp.wf is None:
+            return
+
+        # Take everything the callback has written so far
+        inp.high_water = max(inp.high_water, inp.ring.available())
+        times = inp.times.read()
+        inp.clock_fit.add(times[:, 0], times[:, 2])
+        x = inp.ring.read()
+        if x.size == 0 and not final:
+            return
+
+        # Capture time of the last sample read: the callback time of the
+        # last block (monotonic), in epoch seconds. A block written between
+        # the two reads above has no stamp yet, which is off by one block.
+        if len(times):
+            end_time = times[-1, 2] + pytime.time() - pytime.monotonic()
+        else:
+            end_time = pytime.time()
+
+        # Stereo → mono
+        if x.ndim == 2:
+            x = x.mean(axis=1)
+
+        fs = int(self.sampling_rate)
+
+        # Acoustic features of the unscrambled signal (~10 Hz sidecar)
+        if inp.features is None:
+            inp.features = AudioFeatures(fs)
+        feats = inp.features.process(x, end_time)
+        if feats.size and inp.feat_file is not None:
+            inp.feat_file.write(feats.tobytes())
+            inp.feat_file.flush()
+
+        pending = inp.scramble_buf.size
+        y = self._scramble(x, inp)
+
+        # Which device frames went into the scrambled output (for the timing sidecar)
+        used = pending + x.size - inp.scramble_buf.size
+        if y.size:
+            inp.scr_anchors = inp.scr_anchors[-3:] + [(inp.scr_out, inp.in_used, y.size, used)]
+        inp.scr_out += y.size
+        inp.in_used += used
 
         # --- Output rate (skip resample if already matching)
         target_rate = int(self.final_rate)
         if target_rate != fs:
-            from fractions import Fraction
-            frac = Fraction(target_rate, fs).limit_denominator(1000)
-            y = sps.resample_poly(y, frac.numerator, frac.denominator).astype(np.float32)
+            if inp.resampler is None:
+                from fractions import Fraction
+                frac = Fraction(target_rate, fs).limit_denominator(1000)
+                inp.resampler = StreamingResampler(frac.numerator, frac.denominator)
+            y = inp.resampler.process(y)
+            if final:
+                y = np.concatenate([y, inp.resampler.flush()])
+
+        if y.size == 0:
+            return
 
         # --- Smoothed gain to avoid level jumps (no per-block hard normalize)
         block_peak = float(np.max(np.abs(y)) if y.size else 0.0) or 1e-6
-        if self._peak_slow is None:
-            self._peak_slow = block_peak
+        if inp.peak_slow is None:
+            inp.peak_slow = block_peak
 
         # quick attack, slower release
         alpha_up, alpha_dn = 0.35, 0.05
-        a = alpha_up if block_peak > self._peak_slow else alpha_dn
-        self._peak_slow = a * block_peak + (1 - a) * self._peak_slow
+        a = alpha_up if block_peak > inp.peak_slow else alpha_dn
+        inp.peak_slow = a * block_peak + (1 - a) * inp.peak_slow
 
         target_lin = 10.0 ** (-10.0 / 20.0)  # ≈ -1 dBFS
-        desired_gain = target_lin / max(self._peak_slow, 1e-6)
-        self._gain = 0.2 * desired_gain + 0.8 * self._gain
+        desired_gain = target_lin / max(inp.peak_slow, 1e-6)
+        inp.gain = 0.2 * desired_gain + 0.8 * inp.gain
 
-        y = np.clip(y * self._gain, -1.0, 1.0)
+        y = np.clip(y * inp.gain, -1.0, 1.0)
 
         # Write as int16
         pcm16 = np.int16(y * 32767)
         try:
-            self.wf.writeframes(pcm16.tobytes())
+            self._write_timing(inp, y.size, times)
+            self._write_chunk(inp, pcm16)
         except Exception as e:
             print(f"Audio write error: {e}")
 
+    def _write_timing(self, inp, n_out, times):
+        """Appends one TIMING_DTYPE record for a write of n_out samples.
 
-
-
-
-
+        The resampler keeps resample_poly's alignment (output j <-> scrambled
+        sample j * fs / final_rate), and each scrambled block covers a known
+        range of device frames, so the first sample of the write maps to a
+        device frame by interpolation.
+        """
+        total_out = inp.resampler.n_out if inp.resampler is not None else inp.scr_out
+        s = (total_out - n_out) * self.sampling_rate / self.final_rate
+        starts = [a[0] for a in inp.scr_anchors] + [inp.scr_anchors[-1][0] + inp.scr_anchors[-1][2]]
+        frames = [a[1] for a in inp.scr_anchors] + [inp.scr_anchors[-1][1] + inp.scr_anchors[-1][3]]
+        frame = float(np.interp(s, starts, frames))
+
+        inp.sample_fit.add([inp.file_samples], [frame])
+
+        rec = np.zeros((), dtype=TIMING_DTYPE)
+        rec["sample"] = inp.file_samples
+        rec["frame"] = frame
+        if len(times):
+            rec["cb_frame"], rec["adc_time"], rec["monotonic"] = times[0]
+            rec["time"] = times[0, 2] + pytime.time() - pytime.monotonic()
+        inp.ts_file.write(rec.tobytes())
+        inp.ts_file.flush()
+        inp.file_samples += n_out
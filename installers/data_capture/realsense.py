@@ -13,19 +13,133 @@ from utils import save_pid
 # Stores both RGB (as video) and depth (gzip compressed) into chunks.
 # For decoding the h5 see the decode_depth.py script. 
 # Each .h5 file holds [1, fps * 1800] images
+#
+# With crop_user=True only a fixed-size window around the nearest body
+# (head at its top) is stored, with pixels outside the tracked body box
+# set to 0 so they compress to almost nothing; the per-frame (x, y)
+# offset of that window is kept in the "offsets" dataset. A low-rate head distance / presence series is
+# written next to the chunks ({name}_head_{time}.csv, one row/second).
 ######################################################################
 
 def formatted_time():
     return "{:%Y-%m-%d$%H-%M-%S-%f}".format(datetime.now())
 
 
+class UserTracker:
+    """Tracks a bounding box around the nearest body in a depth frame.
+
+    Works on a subsampled copy of the raw z16 frame, so it is cheap enough
+    to run on every stored depth frame. The crop window has a fixed size so
+    all cropped frames of a chunk fit into one HDF5 dataset; its top follows
+    the head, and `box` (full-resolution x0, y0, x1, y1 of the body plus
+    `margin`, None while nobody is present) tells which part of it to keep.
+    """
+
+    def __init__(
+        self,
+        resolution=(640, 480),
+        crop_size=(224, 224),
+        depth_scale=0.001,
+        min_range=0.2,
+        max_range=2.0,
+        body_depth=0.4,
+        min_pixels=150,
+        step=4,
+        smoothing=0.3,
+        margin=16,
+    ):
+        self.resolution = resolution
+        self.crop_size = (min(crop_size[0], resolution[0]), min(crop_size[1], resolution[1]))
+        self.depth_scale = depth_scale
+        self.min_range = min_range      # meters, ignore everything closer (noise)
+        self.max_range = max_range      # meters, nobody sits further away
+        self.body_depth = body_depth    # meters behind the nearest point still counted as body
+        self.min_pixels = min_pixels    # subsampled pixels needed to call someone present
+        self.step = step                # subsampling step for the tracking mask
+        self.smoothing = smoothing      # EMA factor for the crop center
+        self.margin = margin            # pixels kept around the body box
+        self.box = None
+
+        # Start centered, so the first crops are sensible even if nobody is there
+        self.center = (resolution[0] / 2.0, resolution[1] / 2.0)
+
+    def update(self, depth_raw):
+        """Update the track with a raw z16 frame.
+
+        Returns:
+            (x0, y0, head_distance, present): top-left corner of the crop window,
+            median head distance in meters (nan if not present) and presence flag.
+        """
+        small = depth_raw[:: self.step, :: self.step].astype(np.float32) * self.depth_scale
+        valid = (small > self.min_range) & (small < self.max_range)
+
+        head_distance = float("nan")
+        present = False
+        self.box = None
+
+        if np.count_nonzero(valid) >= self.min_pixels:
+            nearest = np.percentile(small[valid], 5)
+            body = valid & (small < nearest + self.body_depth)
+
+            if np.count_nonzero(body) >= self.min_pixels:
+                present = True
+                rows = np.flatnonzero(body.any(axis=1))
+                cols = np.flatnonzero(body.any(axis=0))
+                top, bottom = rows[0], rows[-1]
+                left, right = cols[0], cols[-1]
+
+                # Head = top quarter of the body box
+                head_rows = max(1, (bottom - top + 1) // 4)
+                head = body[top : top + head_rows]
+                head_distance = float(np.median(small[top : top + head_rows][head]))
+
+                # Horizontally centered on the body, vertically on the head, so the
+                # head stays in the window when the torso runs out of the frame
+                cx = (left + right + 1) / 2.0 * self.step
+                cy = top * self.step + self.crop_size[1] / 2.0
+                m = self.margin
+                self.box = (
+                    max(0, left * self.step - m),
+                    max(0, top * self.step - m),
+                    min(self.resolution[0], (right + 1) * self.step + m),
+                    min(self.resolution[1], (bottom + 1) * self.step + m),
+                )
+                a = self.smoothing
+                self.center = (
+                    a * cx + (1 - a) * self.center[0],
+                    a * cy + (1 - a) * self.center[1],
+                )
+
+        w, h = self.crop_size
+        x0 = int(round(self.center[0] - w / 2.0))
+        y0 = int(round(self.center[1] - h / 2.0))
+        x0 = min(max(x0, 0), self.resolution[0] - w)
+        y0 = min(max(y0, 0), self.resolution[1] - h)
+
+        return x0, y0, head_distance, present
+
+
 class Realsense(Camera):
     """Camera class for RGB & Depth image capture"""
 
-    def __init__(self, fps=30, resolution=(640, 480), chunk_size=30*60, save_directory="data/realsense"):
+    def __init__(
+        self,
+        fps=30,
+        resolution=(640, 480),
+        chunk_size=30*60,
+        save_directory="data/realsense",
+        crop_user=False,
+        crop_size=(224, 224),
+        head_interval=1.0,
+    ):
         super(Realsense, self).__init__(fps, resolution, save_directory)
 
         self.chunk_size = chunk_size
+
+        # Optional user-region cropping (see UserTracker)
+        self.crop_user = crop_user
+        self.crop_size = crop_size
+        self.head_interval = head_interval  # seconds per row of the head distance series
         
         print(
             f"Realsense camera set with FPS: {self.fps} and resolution: {self.resolution}!"
@@ -80,6 +194,19 @@ class Realsense(Camera):
        
         self.profile = self.pipeline.start(self.config)
 
+        tracker = None
+        head_file = None
+        if self.crop_user:
+            depth_scale = self.profile.get_device().first_depth_sensor().get_depth_scale()
+            tracker = UserTracker(
+                resolution=self.resolution,
+                crop_size=self.crop_size,
+                depth_scale=depth_scale,
+            )
+            os.makedirs(f"{self.save_directory}/depth", exist_ok=True)
+            head_file = open(f"{self.save_directory}/depth/{name}_head_{formatted_time()}.csv", "w")
+            head_file.write("timestamp,head_distance_m,presence\n")
+
         if seconds is None or seconds < 0:
             seconds = float("inf")
 
@@ -99,6 +226,12 @@ class Realsense(Camera):
             # Initialize containers for depth frames and timestamps
             chunk_frames = []
             chunk_timestamps = []
+            chunk_offsets = []
+
+            # Running head distance / presence for the low-rate series
+            head_values = []
+            presence_values = []
+            next_head_row = time.time() + self.head_interval
 
             # Ensure directories exist
             os.makedirs(f"{self.save_directory}/rgb", exist_ok=True)
@@ -120,7 +253,8 @@ class Realsense(Camera):
                 counter += 1
 
                 # Convert frames to numpy arrays
-                depth_image = np.asanyarray(depth_frame.get_data(), dtype=np.float32) / 65535.0
+                depth_raw = np.asanyarray(depth_frame.get_data())
+                depth_image = depth_raw.astype(np.float32) / 65535.0
                 depth_image = np.array(depth_image, dtype=np.float16)  # Cast to float16 for efficiency
                 color_image = np.asanyarray(color_frame.get_data())
 
@@ -132,17 +266,39 @@ class Realsense(Camera):
 
                 # Store depth frame and timestamp in memory
                 if counter % 3 == 0:
+                    if tracker is not None:
+                        x0, y0, head_distance, present = tracker.update(depth_raw)
+                        w, h = tracker.crop_size
+                        depth_image = depth_image[y0 : y0 + h, x0 : x0 + w]
+                        if tracker.box is not None:
+                            bx0, by0, bx1, by1 = tracker.box
+                            keep = np.zeros(depth_image.shape, dtype=bool)
+                            keep[max(by0 - y0, 0) : max(by1 - y0, 0), max(bx0 - x0, 0) : max(bx1 - x0, 0)] = True
+                            depth_image = np.where(keep, depth_image, 0).astype(np.float16)
+                        chunk_offsets.append((x0, y0))
+
+                        if present:
+                            head_values.append(head_distance)
+                        presence_values.append(present)
+
+                        if time.time() >= next_head_row:
+                            write_head_row(head_file, timestamp, head_values, presence_values)
+                            head_values = []
+                            presence_values = []
+                            next_head_row += self.head_interval
+
                     chunk_frames.append(depth_image)
                     chunk_timestamps.append(timestamp)
 
                 # Check if the chunk is full (30 minutes of data)
                 if len(chunk_frames) // (self.fps // 3) >= self.chunk_size:
                     depth_chunk_path = f"{self.save_directory}/depth/{name}_{current_ft}.h5"
-                    save_depth_chunk(depth_chunk_path, chunk_frames, chunk_timestamps)
+                    save_depth_chunk(depth_chunk_path, chunk_frames, chunk_timestamps, chunk_offsets)
 
                     # Reset chunk containers
                     chunk_frames = []
                     chunk_timestamps = []
+                    chunk_offsets = []
                     current_ft = formatted_time()  # Update timestamp for new chunk
 
             # Save any remaining frames at the end
@@ -152,17 +308,35 @@ class Realsense(Camera):
 
         finally:
             depth_chunk_path = f"{self.save_directory}/depth/{name}_{current_ft}.h5"
-            save_depth_chunk(depth_chunk_path, chunk_frames, chunk_timestamps)
+            save_depth_chunk(depth_chunk_path, chunk_frames, chunk_timestamps, chunk_offsets)
+            if head_file is not None:
+                head_file.close()
             out.release()
             self.pipeline.stop()
 
 
-def save_depth_chunk(filename, depth_frames, timestamps):
-    """Saves a chunk of depth frames and timestamps to an HDF5 file."""
+def write_head_row(head_file, timestamp, head_values, presence_values):
+    """Appends one aggregated row to the head distance series."""
+    distance = float(np.median(head_values)) if head_values else float("nan")
+    presence = float(np.mean(presence_values)) if presence_values else 0.0
+    head_file.write(f"{timestamp},{distance:.3f},{presence:.2f}\n")
+    head_file.flush()
+
+
+def save_depth_chunk(filename, depth_frames, timestamps, offsets=None):
+    """Saves a chunk of depth frames and timestamps to an HDF5 file.
+
+    If offsets are given (crop_user mode) they are stored as an (N, 2) array of
+    the (x, y) position of each cropped frame within the full depth frame.
+    """
     with h5py.File(filename, 'w') as hf:
+        depth = np.array(depth_frames)
         hf.create_dataset(
             "depth", 
-            data=np.array(depth_frames), 
+            data=depth, 
+            # One HDF5 chunk = a few whole frames, so readers (depth_reader.py)
+            # can decompress a short time range without touching the rest
+            chunks=(max(1, min(len(depth), 8)),) + depth.shape[1:] if depth.ndim == 3 else None,
             compression="gzip", 
             compression_opts=9
         )
@@ -171,6 +345,12 @@ def save_depth_chunk(filename, depth_frames, timestamps):
             data=np.array(timestamps, dtype='S'),  # Store timestamps as strings
             compression="gzip"
         )
+        if offsets:
+            hf.create_dataset(
+                "offsets",
+                data=np.array(offsets, dtype=np.int16),
+                compression="gzip"
+            )
     print(f"Depth frames and timestamps saved to {filename}")
 
 
@@ -0,0 +1,76 @@
+from math import gcd
+
+import numpy as np
+import scipy.signal as sps
+
+######################################################################
+# Streaming polyphase resampler.
+#
+# Same filter and output alignment as scipy.signal.resample_poly, but the
+# filter is designed once and the input history is carried between calls,
+# so a signal fed in blocks gives exactly the samples resample_poly gives
+# for the whole signal at once (no seams at block boundaries). Outputs are
+# emitted as soon as all of their input samples have arrived; flush()
+# returns the tail at the end of the stream.
+######################################################################
+
+
+class StreamingResampler:
+    def __init__(self, up, down, dtype=np.float32, window=("kaiser", 5.0)):
+        g = gcd(int(up), int(down))
+        self.up = int(up) // g
+        self.down = int(down) // g
+        self.dtype = np.dtype(dtype)
+
+        # Filter design as in resample_poly
+        max_rate = max(self.up, self.down)
+        half_len = 10 * max_rate
+        h = sps.firwin(2 * half_len + 1, 1.0 / max_rate, window=window).astype(self.dtype)
+        h *= self.up
+        n_pre_pad = self.down - half_len % self.down
+        self._h = np.concatenate([np.zeros(n_pre_pad, dtype=self.dtype), h])
+        self._pre_remove = (half_len + n_pre_pad) // self.down
+
+        self._buf = np.zeros(0, dtype=self.dtype)
+        self._buf_start = 0   # input index of self._buf[0]
+        self.n_in = 0         # input samples seen
+        self.n_out = 0        # output samples emitted
+
+    def process(self, x):
+        """Feeds a block of samples and returns all outputs that are now complete."""
+        x = np.asarray(x, dtype=self.dtype)
+        if x.size:
+            self._buf = np.concatenate([self._buf, x])
+            self.n_in += x.size
+
+        # Last output whose newest input sample has arrived
+        last = ((self.n_in - 1) * self.up) // self.down - self._pre_remove
+        return self._emit(last + 1)
+
+    def flush(self):
+        """Returns the remaining outputs, treating the rest of the stream as silence."""
+        total = -(-self.n_in * self.up // self.down)  # ceil, output length of resample_poly
+        return self._emit(total)
+
+    def _emit(self, end):
+        if end <= self.n_out:
+            return np.zeros(0, dtype=self.dtype)
+
+        up, down, taps = self.up, self.down, len(self._h)
+
+        # upfirdn output m of the buffer lines up with stream output j when the
+        # buffer starts at a multiple of down (checked below)
+        assert self._buf_start % down == 0
+        y = sps.upfirdn(self._h, self._buf, up, down)
+        m0 = self.n_out + self._pre_remove - self._buf_start * up // down
+        out = y[m0 : m0 + end - self.n_out].astype(self.dtype, copy=False)
+        self.n_out = end
+
+        # Drop history that no future output needs (keep the start a multiple of down)
+        needed = ((self.n_out + self._pre_remove) * down - (taps - 1)) // up
+        keep_from = max(self._buf_start, needed - needed % down)
+        if keep_from > self._buf_start:
+            self._buf = self._buf[keep_from - self._buf_start :]
+            self._buf_start = keep_from
+
+        return out
@@ -0,0 +1,154 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+######################################################################
+# Preallocated single-producer / single-consumer ring buffer.
+#
+# Meant for handing audio blocks from the PortAudio callback to the
+# writer: write() only copies into the preallocated array and never
+# allocates or blocks. If the consumer falls behind, the whole incoming
+# block is dropped and counted as an overrun.
+#
+# Read/write positions are running totals of frames (never wrapped), so
+# there is no full/empty ambiguity. The producer only ever updates the
+# write position and the consumer only the read position, and each does
+# so after copying the data, so no lock is needed.
+#
+# RingBuffer.shared() puts data and counters into one shared memory
+# block, so producer and consumer can live in different processes (the
+# buffer can be passed to a multiprocessing.Process and re-attaches by
+# name when unpickled).
+######################################################################
+
+WRITE_POS = 0
+READ_POS = 1
+OVERRUNS = 2       # number of dropped blocks
+DROPPED = 3        # number of dropped frames
+N_COUNTERS = 4
+
+
+class RingBuffer:
+    def __init__(self, capacity, channels=1, dtype=np.float32, data=None, counters=None):
+        """
+        Args:
+            capacity (int): Number of frames the buffer holds.
+            channels (int): Samples per frame.
+            data (np.ndarray, optional): Preallocated (capacity, channels) storage.
+            counters (np.ndarray, optional): Preallocated int64 array of N_COUNTERS.
+        """
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self.data = data if data is not None else np.zeros((self.capacity, self.channels), dtype=dtype)
+        self.counters = counters if counters is not None else np.zeros(N_COUNTERS, dtype=np.int64)
+        self.shm = None
+
+    # ------------------------------------------------------------------ #
+    #  Shared memory                                                     #
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def shared(cls, capacity, channels=1, dtype=np.float32, name=None):
+        """Creates a ring buffer in shared memory (or attaches to an existing block by name)."""
+        dtype = np.dtype(dtype)
+        size = N_COUNTERS * 8 + int(capacity) * int(channels) * dtype.itemsize
+        shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+
+        counters = np.ndarray((N_COUNTERS,), dtype=np.int64, buffer=shm.buf)
+        data = np.ndarray((int(capacity), int(channels)), dtype=dtype, buffer=shm.buf, offset=N_COUNTERS * 8)
+        if name is None:
+            counters[:] = 0
+
+        ring = cls(capacity, channels, dtype, data=data, counters=counters)
+        ring.shm = shm
+        return ring
+
+    def __getstate__(self):
+        if self.shm is None:
+            return self.__dict__
+        return {"name": self.shm.name, "capacity": self.capacity,
+                "channels": self.channels, "dtype": self.data.dtype.str}
+
+    def __setstate__(self, state):
+        if "name" not in state:
+            self.__dict__.update(state)
+            return
+        other = RingBuffer.shared(state["capacity"], state["channels"], state["dtype"], name=state["name"])
+        self.__dict__.update(other.__dict__)
+
+    def close(self, unlink=False):
+        """Releases the shared memory block (unlink=True in the process that created it)."""
+        if self.shm is None:
+            return
+        self.data = self.data.copy()
+        self.counters = self.counters.copy()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+    # ------------------------------------------------------------------ #
+    #  State                                                             #
+    # ------------------------------------------------------------------ #
+    @property
+    def written(self):
+        """Total number of frames ever accepted."""
+        return int(self.counters[WRITE_POS])
+
+    @property
+    def overruns(self):
+        return int(self.counters[OVERRUNS])
+
+    @property
+    def dropped(self):
+        return int(self.counters[DROPPED])
+
+    def available(self):
+        """Frames waiting to be read."""
+        return int(self.counters[WRITE_POS] - self.counters[READ_POS])
+
+    def free(self):
+        return self.capacity - self.available()
+
+    # ------------------------------------------------------------------ #
+    #  Producer side                                                     #
+    # ------------------------------------------------------------------ #
+    def write(self, block):
+        """Copies a (frames, channels) block in. Returns False if it was dropped."""
+        n = len(block)
+        w = int(self.counters[WRITE_POS])
+        r = int(self.counters[READ_POS])
+
+        if n > self.capacity - (w - r):
+            self.counters[OVERRUNS] += 1
+            self.counters[DROPPED] += n
+            return False
+
+        i = w % self.capacity
+        first = min(n, self.capacity - i)
+        self.data[i : i + first] = block[:first]
+        if first < n:
+            self.data[: n - first] = block[first:]
+
+        # Publish only after the data is in place
+        self.counters[WRITE_POS] = w + n
+        return True
+
+    # ------------------------------------------------------------------ #
+    #  Consumer side                                                     #
+    # ------------------------------------------------------------------ #
+    def read(self, max_frames=None):
+        """Returns (a copy of) up to max_frames pending frames, oldest first."""
+        w = int(self.counters[WRITE_POS])
+        r = int(self.counters[READ_POS])
+        n = w - r if max_frames is None else min(w - r, max_frames)
+
+        out = np.empty((n, self.channels), dtype=self.data.dtype)
+        i = r % self.capacity
+        first = min(n, self.capacity - i)
+        out[:first] = self.data[i : i + first]
+        if first < n:
+            out[first:] = self.data[: n - first]
+
+        # Free the space only after copying out
+        self.counters[READ_POS] = r + n
+        return out
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from audio_reader import read_audio_chunk
+
+sf = pytest.importorskip("soundfile")
+
+# Writes a FLAC chunk like Mic does and dies without closing it
+WRITER = """
+import os, sys
+import numpy as np
+import soundfile as sf
+f = sf.SoundFile(sys.argv[1], "w", samplerate=8000, channels=1, format="FLAC", subtype="PCM_16")
+x = (np.sin(np.arange(800000) * 0.01) * 0.5).astype(np.float32)
+for i in range(0, len(x), 4000):
+    f.write(x[i : i + 4000])
+f.flush()
+os._exit(0)
+"""
+
+
+def test_truncated_flac_loses_only_the_last_frame(tmp_path):
+    path = str(tmp_path / "killed.flac")
+    subprocess.run([sys.executable, "-c", WRITER, path], check=True)
+
+    data, rate = read_audio_chunk(path)
+
+    assert rate == 8000
+    # Only the encoder frame that was never flushed (4096 samples) may be missing
+    assert 800000 - 4096 <= len(data) <= 800000
+    expected = (np.sin(np.arange(len(data)) * 0.01) * 0.5).astype(np.float32)
+    assert np.allclose(data, expected, atol=1e-3)
+
+
+def test_complete_flac_is_read_fully(tmp_path):
+    path = str(tmp_path / "ok.flac")
+    x = (np.sin(np.arange(100000) * 0.01) * 0.5).astype(np.float32)
+    sf.write(path, x, 8000, format="FLAC", subtype="PCM_16")
+
+    data, rate = read_audio_chunk(path, block=4096)
+
+    assert len(data) == len(x)
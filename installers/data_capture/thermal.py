@@ -1,13 +1,15 @@
 import os
+import queue
+import threading
 import time
 from datetime import datetime
 from utils import save_pid
 
 import numpy as np
-import pandas as pd
 import tifffile
 from camera import Camera
 from flirpy.camera.lepton import Lepton
+from thermal_reader import ROI_DTYPE
 
 
 def formatted_time():
@@ -41,34 +43,62 @@ class Thermal(Camera):
 
         return img / 100 - 273.15
 
-    def saveToDisk(self, name, img, start_time):
-        if img is not None and len(img) > 0:
-            tifffile.imwrite(
-                f"{self.save_directory}/{name}_{start_time}.tiff",
-                img,
-                photometric="minisblack",
-                bigtiff=True,
-                compression="lzw",
-            )
-        else:
-            print("No image, skipping [thermal.py]")
-    
-    def saveFrameTime(self, name, time_dataframe, start_time):
-        if time_dataframe is not None and len(time_dataframe) > 0:
-            time_dataframe.to_csv(
-                f"{self.save_directory}/{name}_{start_time}.csv"
-            )
+    def grabLoop(self, frames, stop, stats):
+        """Grab thread: only reads the sensor and queues (frame, time) pairs.
+
+        If the processing side falls behind, the frame is dropped and counted
+        instead of blocking the sensor read.
+        """
+        last_time = None
+        period = 1.0 / self.fps
+
+        try:
+            while not stop.is_set():
+                frame = self.camera.grab()
+                frame_time = time.time()
+
+                if frame is None:
+                    print("Can't receive frame. Exiting...")
+                    break
+
+                # Frames the sensor produced but we did not read in time
+                if last_time is not None and frame_time - last_time > 1.5 * period:
+                    stats["sensor_gaps"] += int(round((frame_time - last_time) / period)) - 1
+                last_time = frame_time
+
+                try:
+                    frames.put_nowait((frame, frame_time))
+                except queue.Full:
+                    stats["queue_drops"] += 1
+        except Exception as e:
+            print("Thermal camera error!", e)
+        finally:
+            # Tell the processing side we are done. Never block here: if it
+            # stopped reading, the queue stays full, so make room by dropping
+            # the oldest frame.
+            while True:
+                try:
+                    frames.put_nowait(None)
+                    break
+                except queue.Full:
+                    try:
+                        frames.get_nowait()
+                        stats["queue_drops"] += 1
+                    except queue.Empty:
+                        pass
 
     def captureImages(
         self,
         name="out",
         seconds=10,
-        to_celsius=True,
         start_event=None,
-        # self.chunk_size=1200,
     ):
-        """to_celsius: Whether to convert the image to celsius or keep values in Kelvin * 100
-        self.chunk_size: interval for saving video in seconds"""
+        """Streams raw frames (Kelvin * 100, uint16) to disk as they arrive.
+        A new file set is started every self.chunk_size seconds. Conversion to
+        celsius happens when reading, see thermal_reader.py.
+
+        Grabbing runs in its own thread so disk writes never delay the sensor.
+        Face / forehead temperature stats of every frame go to a .roi sidecar."""
 
         save_pid("thermal")
         self.initCamera()
@@ -76,48 +106,45 @@ class Thermal(Camera):
         if start_event:
             start_event.wait()
 
-        if seconds < 0 or seconds is None:
+        if seconds is None or seconds < 0:
             seconds = float("inf")
 
         if not os.path.exists(self.save_directory):
             os.makedirs(self.save_directory)
 
-        start_time = time.time()
+        # ~4 s of frames between grabbing and writing
+        frames = queue.Queue(maxsize=max(8, int(4 * self.fps)))
+        stop = threading.Event()
+        stats = {"queue_drops": 0, "sensor_gaps": 0}
+        grabber = threading.Thread(target=self.grabLoop, args=(frames, stop, stats), daemon=True)
 
-        # Array for saving frames & frame times
-        video = []
-        frame_times = []
+        start_time = time.time()
         current_time = start_time
-        format_time = formatted_time()
+        writer = ThermalWriter(self.save_directory, name, formatted_time())
+        grabber.start()
 
         try:
             while time.time() - start_time < seconds:
-                frame = self.camera.grab()  # .astype(np.float32)
-
-                if frame is None:
-                    print("Can't receive frame. Exiting...")
+                try:
+                    item = frames.get(timeout=1.0)
+                except queue.Empty:
+                    if not grabber.is_alive():
+                        break
+                    continue
+                if item is None:
                     break
+                frame, frame_time = item
 
-                # Convert to celsius
-                frame = self.convertToCelsius(frame) if to_celsius else frame
-
-                # Save frame to array
-                video.append(frame)
-
-                # Get frame time & save it to array
-                frame_time = time.time()
-                frame_times.append(frame_time)
-
-                # Write to disk & save time .csv
-                if len(video) > 0 and time.time() - current_time >= self.chunk_size:
-                    self.saveToDisk(name, video, start_time = format_time)
-                    self.saveFrameTime(name, pd.DataFrame(frame_times), start_time = format_time)
+                writer.write(frame, frame_time)
+                writer.write_roi(roi_stats(frame, frame_time, stats))
 
-                    # Empty video & time array
-                    video = []
-                    frame_times = []
+                # Start a new chunk
+                if time.time() - current_time >= self.chunk_size:
+                    writer.close()
+                    print(f"Thermal chunk done: {writer.frames} frames, "
+                          f"{stats['queue_drops']} queue drops, {stats['sensor_gaps']} sensor gaps so far")
+                    writer = ThermalWriter(self.save_directory, name, formatted_time())
                     current_time = time.time()
-                    format_time = formatted_time()
 
         except Exception as e:
             if isinstance(e, KeyboardInterrupt):
@@ -126,14 +153,117 @@ class Thermal(Camera):
                 print("Thermal camera error!", e)
 
         finally:
-            format_time = formatted_time()
-            self.saveToDisk(name, video, start_time = format_time)  # Might cause empty saves but necessary
-            self.saveFrameTime(name, pd.DataFrame(frame_times), start_time = format_time)
-            print("Done...[thermal.py]")
+            stop.set()
+            grabber.join(timeout=2.0)
+
+            # Write whatever the grabber queued before it stopped
+            while True:
+                try:
+                    item = frames.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    break
+                writer.write(item[0], item[1])
+                writer.write_roi(roi_stats(item[0], item[1], stats))
+
+            writer.close()
+            print(f"Done...[thermal.py] ({stats['queue_drops']} queue drops, {stats['sensor_gaps']} sensor gaps)")
+
+
+def roi_stats(frame, frame_time, stats, face_threshold=30.0, forehead_fraction=0.2):
+    """Max / mean temperature (celsius) of the face and forehead region of a raw frame.
+
+    The face is the bounding box of all pixels warmer than face_threshold, the
+    forehead the top forehead_fraction of that box (middle half of its width).
+    NaN if nobody is in view.
+    """
+    record = np.zeros((), dtype=ROI_DTYPE)
+    record["time"] = frame_time
+    record["queue_drops"] = stats["queue_drops"]
+    record["sensor_gaps"] = stats["sensor_gaps"]
+
+    threshold_raw = (face_threshold + 273.15) * 100
+    warm = frame > threshold_raw
+    if not warm.any():
+        for field in ("face_max", "face_mean", "forehead_max", "forehead_mean"):
+            record[field] = np.nan
+        return record
+
+    rows = np.flatnonzero(warm.any(axis=1))
+    cols = np.flatnonzero(warm.any(axis=0))
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+    face = frame[top:bottom, left:right][warm[top:bottom, left:right]]
+    record["face_max"] = face.max() / 100 - 273.15
+    record["face_mean"] = face.mean() / 100 - 273.15
+
+    fh_bottom = top + max(1, int((bottom - top) * forehead_fraction))
+    quarter = (right - left) // 4
+    forehead = frame[top:fh_bottom, left + quarter : right - quarter]
+    if forehead.size == 0:
+        forehead = frame[top:fh_bottom, left:right]
+    record["forehead_max"] = forehead.max() / 100 - 273.15
+    record["forehead_mean"] = forehead.mean() / 100 - 273.15
+
+    return record
+
+
+class ThermalWriter:
+    """Appends raw thermal frames to one chunk on disk.
+
+    Frames go to {name}_{start_time}.tiff as one uint16 BigTIFF page each,
+    frame times (epoch seconds) to {name}_{start_time}.times as raw float64 and
+    per-frame ROI stats to {name}_{start_time}.roi (thermal_reader.ROI_DTYPE).
+    Both files are valid up to the last written frame, so an unclean shutdown
+    only loses the frame being written.
+    """
+
+    def __init__(self, save_directory, name, start_time, compression="lzw", flush_every=8):
+        self.tiff_path = f"{save_directory}/{name}_{start_time}.tiff"
+        self.times_path = f"{save_directory}/{name}_{start_time}.times"
+        self.compression = compression
+        self.flush_every = flush_every
+        self.frames = 0
+
+        self.tif = tifffile.TiffWriter(self.tiff_path, bigtiff=True)
+        self.times = open(self.times_path, "wb")
+        self.roi_path = f"{save_directory}/{name}_{start_time}.roi"
+        self.roi = open(self.roi_path, "wb")
+
+    def write(self, frame, frame_time):
+        self.tif.write(
+            np.asarray(frame, dtype=np.uint16),
+            photometric="minisblack",
+            compression=self.compression,
+        )
+        self.times.write(np.float64(frame_time).tobytes())
+        self.frames += 1
+
+        if self.frames % self.flush_every == 0:
+            self.times.flush()
+            self.roi.flush()
+
+    def write_roi(self, record):
+        self.roi.write(record.tobytes())
+
+    def close(self):
+        if self.tif is None:
+            return
+        self.tif.close()
+        self.times.close()
+        self.roi.close()
+        self.tif = None
+
+        if self.frames == 0:
+            print("No image, skipping [thermal.py]")
+            os.remove(self.tiff_path)
+            os.remove(self.times_path)
+            os.remove(self.roi_path)
 
 
 if __name__ == "__main__":
     lep = Thermal()
     lep.initCamera()
     lep.configureCamera()
-    lep.captureImages(name="test", seconds=10, to_celsius=True, start_event=None)
+    lep.captureImages(name="test", seconds=10, start_event=None)
@@ -0,0 +1,78 @@
+import numpy as np
+import tifffile
+
+######################################################################
+# Readers for the thermal chunks written by thermal.ThermalWriter:
+#   {name}_{start_time}.tiff   raw frames, uint16, Kelvin * 100
+#   {name}_{start_time}.times  frame times, raw little-endian float64
+#   {name}_{start_time}.roi    per-frame face / forehead temperature stats
+#                              (ROI_DTYPE records, celsius; drop counters
+#                              are cumulative since the recording started)
+######################################################################
+
+ROI_DTYPE = np.dtype(
+    [
+        ("time", "<f8"),
+        ("face_max", "<f4"),
+        ("face_mean", "<f4"),
+        ("forehead_max", "<f4"),
+        ("forehead_mean", "<f4"),
+        ("queue_drops", "<u4"),
+        ("sensor_gaps", "<u4"),
+    ]
+)
+
+
+def to_celsius(frames):
+    """Converts raw Kelvin * 100 values to degrees celsius (float32)."""
+    return np.asarray(frames, dtype=np.float32) / 100 - 273.15
+
+
+def read_frame_times(path):
+    """Frame times (epoch seconds) of a chunk, path to either the .tiff or the .times file."""
+    times_path = path.rsplit(".", 1)[0] + ".times"
+    return np.fromfile(times_path, dtype="<f8")
+
+
+def read_roi_stats(path):
+    """Per-frame ROI stats of a chunk as a structured array (see ROI_DTYPE)."""
+    roi_path = path.rsplit(".", 1)[0] + ".roi"
+    return np.fromfile(roi_path, dtype=ROI_DTYPE)
+
+
+def count_frames(path):
+    with tifffile.TiffFile(path) as tif:
+        return len(tif.pages)
+
+
+def read_thermal(path, celsius=True, key=None):
+    """Reads frames of a chunk.
+
+    Args:
+        path (str): Path to the .tiff file.
+        celsius (bool): Convert to celsius, otherwise return the raw uint16 values.
+        key (int, slice or range, optional): Frames to read; all frames if None.
+
+    Returns:
+        np.ndarray: (frames, h, w) array, or (h, w) if key is an int.
+    """
+    with tifffile.TiffFile(path) as tif:
+        if key is None:
+            key = range(len(tif.pages))
+        elif isinstance(key, slice):
+            key = range(*key.indices(len(tif.pages)))
+        frames = tif.asarray(key=key)
+
+    return to_celsius(frames) if celsius else frames
+
+
+def iter_thermal(path, celsius=True, block=64):
+    """Yields (time, frame) pairs of a chunk, reading block frames at a time."""
+    times = read_frame_times(path)
+    n = min(len(times), count_frames(path))
+    for start in range(0, n, block):
+        frames = read_thermal(path, celsius=celsius, key=range(start, min(n, start + block)))
+        if frames.ndim == 2:
+            frames = frames[None]
+        for i, frame in enumerate(frames):
+            yield times[start + i], frame
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+######################################################################
+# SQLite manifest of the video chunks handled by video_filter.py, one
+# database per video folder (.video_filter.sqlite next to the chunks).
+#
+# Every chunk has one row: file name, size and mtime of the video after
+# processing, frame count, state ("processed" or "error"), detector
+# version and timestamps file. A chunk counts as processed when its row
+# says so, the file still has the recorded size and mtime and it was
+# analyzed with the current detector version, so the check is one
+# indexed lookup instead of reading the timestamps file, and a chunk is
+# only redone when the video or the detector changed.
+######################################################################
+
+MANIFEST_NAME = ".video_filter.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    path       TEXT PRIMARY KEY,
+    size       INTEGER,
+    mtime      REAL,
+    frames     INTEGER,
+    state      TEXT,
+    detector   TEXT,
+    timestamps TEXT,
+    updated    REAL
+)
+"""
+
+
+class ProcessingManifest:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def lookup(self, video_file: Path) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT size, mtime, frames, state, detector, timestamps FROM chunks WHERE path = ?",
+            (Path(video_file).name,),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime", "frames", "state", "detector", "timestamps"), row))
+
+    def is_processed(self, video_file: Path, detector: Optional[str] = None) -> Optional[bool]:
+        """True/False from the manifest, None if the chunk is not in it yet.
+
+        With `detector` (a detector version) a chunk analyzed by another
+        detector is not processed; rows without a version (migrated from
+        the timestamps file) are accepted.
+        """
+        entry = self.lookup(video_file)
+        if entry is None:
+            return None
+        try:
+            st = os.stat(video_file)
+        except OSError:
+            return False
+        if detector is not None and entry["detector"] is not None and entry["detector"] != detector:
+            return False
+        return entry["state"] == "processed" and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime
+
+    def record(self, video_file: Path, state: str, frames: Optional[int] = None, detector: Optional[str] = None,
+               timestamps: Optional[Path] = None):
+        """Stores the current size/mtime of a chunk with its processing state."""
+        st = os.stat(video_file)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO chunks (path, size, mtime, frames, state, detector, timestamps, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (Path(video_file).name, st.st_size, st.st_mtime, frames, state, detector,
+             None if timestamps is None else Path(timestamps).name, time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+_manifests = {}
+
+
+def manifest_for(video_file: Path) -> ProcessingManifest:
+    """Manifest of the folder of a chunk (opened once per process)."""
+    folder = str(Path(video_file).parent.resolve())
+    if folder not in _manifests:
+        _manifests[folder] = ProcessingManifest(os.path.join(folder, MANIFEST_NAME))
+    return _manifests[folder]
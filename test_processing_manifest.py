@@ -0,0 +1,46 @@
+import os
+
+from processing_manifest import ProcessingManifest
+
+
+def make_chunk(tmp_path, name="chunk_0001.mp4"):
+    path = tmp_path / name
+    path.write_bytes(b"\0" * 1024)
+    return path
+
+
+def test_processed_chunk_with_same_detector(tmp_path):
+    chunk = make_chunk(tmp_path)
+    manifest = ProcessingManifest(tmp_path / ".video_filter.sqlite")
+    manifest.record(chunk, "processed", frames=10, detector="haar:haarcascade_frontalface_default.xml")
+
+    assert manifest.is_processed(chunk, "haar:haarcascade_frontalface_default.xml") is True
+    assert manifest.is_processed(chunk) is True
+
+
+def test_other_detector_version_triggers_reprocessing(tmp_path):
+    chunk = make_chunk(tmp_path)
+    manifest = ProcessingManifest(tmp_path / ".video_filter.sqlite")
+    manifest.record(chunk, "processed", frames=10, detector="haar:haarcascade_frontalface_default.xml")
+
+    assert manifest.is_processed(chunk, "yunet:face_detection_yunet_2023mar.onnx") is False
+    assert manifest.is_processed(chunk, "haar:my_cascade.xml") is False
+
+
+def test_migrated_row_without_detector_is_kept(tmp_path):
+    chunk = make_chunk(tmp_path)
+    manifest = ProcessingManifest(tmp_path / ".video_filter.sqlite")
+    manifest.record(chunk, "processed")
+
+    assert manifest.is_processed(chunk, "yunet:face_detection_yunet_2023mar.onnx") is True
+
+
+def test_changed_video_and_unknown_chunk(tmp_path):
+    chunk = make_chunk(tmp_path)
+    manifest = ProcessingManifest(tmp_path / ".video_filter.sqlite")
+    assert manifest.is_processed(chunk, "haar:x") is None
+
+    manifest.record(chunk, "processed", detector="haar:x")
+    chunk.write_bytes(b"\0" * 2048)
+    os.utime(chunk, (1, 1))
+    assert manifest.is_processed(chunk, "haar:x") is False
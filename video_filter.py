@@ -1,9 +1,14 @@
 import argparse
+import bisect
 import csv
+import glob
+import json
 import math
+import multiprocessing
 import os
 import re
 import shutil
+import sqlite3
 import subprocess
 import sys
 import tempfile
@@ -12,20 +17,260 @@ from pathlib import Path
 from typing import List, Tuple, Optional
 
 import cv2
+import numpy as np
 
+from face_detectors import DETECTORS, create_detector
+from processing_manifest import manifest_for
 
-def detect_face_count(frame, cascade, resize_width=640, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)) -> int:
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    h, w = gray.shape[:2]
-    if w > resize_width:
-        scale = resize_width / float(w)
-        gray_small = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
-    else:
-        gray_small = gray
-        scale = 1.0
 
-    faces = cascade.detectMultiScale(gray_small, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=min_size)
-    return len(faces)
+def detect_face_count(frame, detector, resize_width=640) -> int:
+    return detector.count(detector.prepare(frame, resize_width))
+
+
+def iter_face_counts(frames, detector, resize_width: int):
+    """Yields the face count of every frame, detecting batch_size frames at a time."""
+    batch = []
+    for frame in frames:
+        batch.append(detector.prepare(frame, resize_width))
+        if len(batch) == detector.batch_size:
+            yield from detector.count_batch(batch)
+            batch = []
+    if batch:
+        yield from detector.count_batch(batch)
+
+
+def adaptive_stride(fps: float, min_zero_seconds: float) -> int:
+    """Largest detection stride for which adaptive counting still gives the dense keep segments."""
+    return max(1, int(math.ceil(min_zero_seconds * fps)))
+
+
+def count_faces_adaptive(frames, detector, resize_width: int, stride: int, counts: Optional[List[int]] = None,
+                         on_sample=None) -> Tuple[List[int], int]:
+    """Face counts of a frame sequence, running the detector on every stride-th frame only.
+
+    The first and the last frame and every stride-th frame in between are
+    samples. Frames between two samples that both see faces are filled in
+    (first half with the earlier count, second half with the later one)
+    without running the detector: any zero run hidden there is shorter than
+    stride <= min_zero_frames and is never cut. All other gaps (a transition,
+    or no face at either end) are re-checked frame by frame, so with
+    stride <= adaptive_stride(fps, min_zero_seconds) compute_keep_segments
+    gives exactly the segments of a dense analysis. The small frames of one
+    gap are buffered for that (and re-checked as one batch).
+
+    Counts are appended to `counts` (a new list by default); on_sample(counts)
+    is called whenever they are final up to a sample.
+
+    Returns (counts, detector calls).
+    """
+    counts = [] if counts is None else counts
+    calls = 0
+    last = None    # count of the previous sample
+    gap = []       # small frames after the previous sample
+
+    def close_gap(sample):
+        nonlocal calls, last
+        c = detector.count(sample)
+        calls += 1
+        if last is not None:
+            if last > 0 and c > 0:
+                half = (len(gap) + 1) // 2
+                counts.extend([last] * half + [c] * (len(gap) - half))
+            else:
+                counts.extend(detector.count_batch(gap))
+                calls += len(gap)
+        counts.append(c)
+        last = c
+        gap.clear()
+        if on_sample is not None:
+            on_sample(counts)
+
+    for frame in frames:
+        img = detector.prepare(frame, resize_width)
+        if last is None or len(gap) == stride - 1:
+            close_gap(img)
+        else:
+            gap.append(img)
+    if gap:
+        close_gap(gap.pop())
+    return counts, calls
+
+
+def follow_box(prev_gray, gray, box):
+    """Moves a face box by the median sparse optical flow (Lucas-Kanade) of the corners inside it."""
+    x, y, w, h = box
+    pts = cv2.goodFeaturesToTrack(prev_gray[y : y + h, x : x + w], 20, 0.01, 3)
+    if pts is None:
+        return box
+    pts = (pts + np.float32([x, y])).astype(np.float32)
+    moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, pts, None)
+    ok = status.ravel() == 1
+    if not ok.any():
+        return box
+    dx, dy = np.median((moved - pts).reshape(-1, 2)[ok], axis=0)
+    return int(round(x + dx)), int(round(y + dy)), w, h
+
+
+def detect_in_roi(detector, img, box, margin=0.5):
+    """Face box nearest to `box` found by running the detector on the region around it only, or None."""
+    x, y, w, h = box
+    height, width = img.shape[:2]
+    x0, y0 = max(0, int(x - margin * w)), max(0, int(y - margin * h))
+    x1, y1 = min(width, int(x + w + margin * w)), min(height, int(y + h + margin * h))
+    if x1 - x0 < w // 2 or y1 - y0 < h // 2:
+        return None
+    boxes = detector.detect(img[y0:y1, x0:x1])
+    if not boxes:
+        return None
+    cx, cy = x + w / 2 - x0, y + h / 2 - y0
+    bx, by, bw, bh = min(boxes, key=lambda b: (b[0] + b[2] / 2 - cx) ** 2 + (b[1] + b[3] / 2 - cy) ** 2)
+    return bx + x0, by + y0, bw, bh
+
+
+def count_faces_tracked(frames, detector, resize_width: int, redetect: int, counts: Optional[List[int]] = None,
+                        on_frame=None) -> Tuple[List[int], int, int]:
+    """Face counts of a frame sequence, following faces between full-frame detections.
+
+    The full frame is searched on the first frame, every `redetect` frames
+    and whenever no face is tracked. In between, every face box is moved
+    with sparse optical flow on the small gray frame and confirmed by the
+    detector on a region around it only. If a face is not found in its
+    region, the frame falls back to a full detection, so a count only drops
+    (and a zero run only starts) on a full detection. A new face next to a
+    tracked one is picked up by the next full detection at the latest.
+
+    Counts are appended to `counts` (a new list by default); on_frame(counts)
+    is called after every frame. Returns (counts, full detections, region detections).
+    """
+    counts = [] if counts is None else counts
+    full_calls = roi_calls = 0
+    tracks = []
+    prev_gray = None
+    since_full = 0
+
+    for frame in frames:
+        img = detector.prepare(frame, resize_width)
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        found = None
+        if tracks and since_full < redetect:
+            found = []
+            for box in tracks:
+                hit = detect_in_roi(detector, img, follow_box(prev_gray, gray, box))
+                roi_calls += 1
+                if hit is None:
+                    found = None
+                    break
+                if hit not in found:
+                    found.append(hit)
+        if found is None:
+            found = detector.detect(img)
+            full_calls += 1
+            since_full = 0
+
+        tracks = found
+        since_full += 1
+        prev_gray = gray
+        counts.append(len(tracks))
+        if on_frame is not None:
+            on_frame(counts)
+    return counts, full_calls, roi_calls
+
+
+def read_frames(cap, n: Optional[int] = None):
+    """Yields the next frames of a capture (at most n) and releases it."""
+    try:
+        while n is None or n > 0:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield frame
+            if n is not None:
+                n -= 1
+    finally:
+        cap.release()
+
+
+def read_frames_ffmpeg(input_path: str, width: int, height: int, fps: float, resize_width: int, color: bool = False,
+                       start: int = 0, n: Optional[int] = None, buffers: int = 1):
+    """Yields frames decoded by ffmpeg, already scaled to resize_width and gray (or BGR if color).
+
+    ffmpeg decodes with all its threads and scales with swscale; the raw
+    frames are read from the pipe straight into `buffers` preallocated
+    arrays that are reused in turn, so a yielded frame stays valid only
+    while the next buffers - 1 frames are read. Starts at frame `start`
+    (accurate seek) and stops after n frames.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not found in PATH. Install ffmpeg or use --decoder opencv.")
+
+    out_w, out_h = width, height
+    if width > resize_width:
+        scale = resize_width / float(width)
+        out_w, out_h = int(width * scale), int(height * scale)
+
+    cmd = ["ffmpeg", "-v", "error", "-threads", "0"]
+    if start > 0:
+        cmd += ["-ss", f"{(start - 0.5) / fps:.6f}"]
+    cmd += ["-i", input_path, "-map", "0:v:0", "-vsync", "0"]
+    if n is not None:
+        cmd += ["-frames:v", str(n)]
+    if (out_w, out_h) != (width, height):
+        cmd += ["-vf", f"scale={out_w}:{out_h}:flags=bilinear"]
+    cmd += ["-pix_fmt", "bgr24" if color else "gray", "-f", "rawvideo", "-"]
+
+    shape = (buffers, out_h, out_w, 3) if color else (buffers, out_h, out_w)
+    frames = np.empty(shape, dtype=np.uint8)
+    size = frames[0].nbytes
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        i = 0
+        while True:
+            frame = frames[i % buffers]
+            view = memoryview(frame).cast("B")
+            got = 0
+            while got < size:
+                r = proc.stdout.readinto(view[got:])
+                if not r:
+                    break
+                got += r
+            if got < size:
+                break
+            yield frame
+            i += 1
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {input_path}")
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def open_frames(input_path: str, decoder: str = "opencv", resize_width: int = 640, color: bool = False,
+                start: int = 0, n: Optional[int] = None, buffers: int = 1):
+    """Frame generator of a video from frame `start` (at most n frames), and its fps, width and height.
+
+    decoder "opencv" yields full BGR frames from cv2.VideoCapture, "ffmpeg"
+    yields detector-sized frames (see read_frames_ffmpeg).
+    """
+    if decoder == "ffmpeg":
+        fps, width, height, _ = video_info(input_path)
+        frames = read_frames_ffmpeg(input_path, width, height, fps, resize_width, color, start, n, buffers)
+        return frames, fps, width, height
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video: {input_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+            cap.release()
+            raise RuntimeError(f"Failed to seek to frame {start}: {input_path}")
+    return read_frames(cap, n), fps, width, height
 
 
 def compute_keep_segments(counts: List[int], fps: float, min_zero_seconds: float) -> List[Tuple[int, int]]:
@@ -91,6 +336,39 @@ def check_if_processed(timestamps_path: str) -> bool:
         return False
 
 
+def is_already_processed(video_file: Path, timestamp_path: Path, detector=None) -> bool:
+    """Processed state of a chunk from its folder's manifest (see processing_manifest.py).
+
+    With a detector, chunks analyzed by another detector version count as
+    not processed. Chunks not in the manifest yet (processed before it
+    existed) fall back to scanning the timestamps file once and are added
+    to the manifest.
+    """
+    try:
+        manifest = manifest_for(video_file)
+        known = manifest.is_processed(video_file, detector.version if detector else None)
+        if known is not None:
+            return known
+        if check_if_processed(str(timestamp_path)):
+            manifest.record(video_file, "processed", timestamps=timestamp_path)
+            return True
+        return False
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: manifest not available for {video_file.name} ({e}), reading the timestamp file")
+        return check_if_processed(str(timestamp_path))
+
+
+def record_status(video_file: Path, timestamp_path: Path, status: str, frames: Optional[int] = None, detector=None):
+    """Stores the outcome of a chunk ("processed" or "error") in its folder's manifest."""
+    if status not in ("processed", "error"):
+        return
+    try:
+        manifest_for(video_file).record(video_file, status, frames, detector.version if detector else None,
+                                        timestamp_path)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: could not update the manifest for {video_file.name}: {e}")
+
+
 def write_counts_to_timestamps(counts: List[int], fps: float, timestamps_path: str):
     """Add face counts to existing timestamp file."""
     if not os.path.exists(timestamps_path):
@@ -151,31 +429,130 @@ def extract_date_from_filename(filename: str) -> Optional[str]:
     return match.group(1) if match else None
 
 
-def analyze_video_counts(input_path: str, resize_width: int) -> Tuple[List[int], float, int, int]:
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Failed to open video: {input_path}")
+def load_detector(name: str = "haar", model: Optional[str] = None, threads: int = 0):
+    """Face detector backend by name (see face_detectors.py)."""
+    return create_detector(name, model, threads)
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-    if cascade.empty():
-        raise RuntimeError("Failed to load Haar cascade. Ensure opencv-data is available.")
+def checkpoint_path_for(input_path: str, start: int = 0) -> str:
+    """Checkpoint sidecar of the analysis of a video (of the range starting at `start`)."""
+    return f"{input_path}.faces.ckpt" if start == 0 else f"{input_path}.faces-{start}.ckpt"
+
+
+def checkpoint_key(input_path: str, detector, resize_width: int, start: int = 0, stop: Optional[int] = None,
+                   stride: int = 1, decoder: str = "opencv", redetect: int = 0) -> dict:
+    """What a checkpoint must have been made with to be resumed: the same file, detector, range
+    and counting method (adaptive stride, decoder, tracking), so counts never mix two methods."""
+    st = os.stat(input_path)
+    return {"size": st.st_size, "mtime": st.st_mtime, "detector": detector.version,
+            "resize_width": resize_width, "start": start, "stop": stop,
+            "stride": stride, "decoder": decoder, "redetect": redetect}
+
+
+def load_checkpoint(path: str, key: dict) -> Tuple[List[int], bool]:
+    """Counts saved by an interrupted analysis with the same key and whether it had finished."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return [], False
+    if state.get("key") != key:
+        return [], False
+    return [int(c) for c in state["counts"]], bool(state.get("done"))
+
+
+def save_checkpoint(path: str, key: dict, counts: List[int], done: bool = False):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"key": key, "done": done, "counts": counts}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def remove_checkpoints(input_path: str):
+    """Drops the checkpoints of a video once its counts are written."""
+    folder, name = os.path.split(input_path)
+    for ckpt in Path(folder or ".").glob(f"{glob.escape(name)}.faces*.ckpt"):
+        ckpt.unlink()
+
+
+def count_frames_checkpointed(input_path: str, start: int, stop: Optional[int], resize_width: int, detector,
+                              stride: int, decoder: str, checkpoint: Optional[str], checkpoint_every: int,
+                              on_count=None, stats: Optional[dict] = None,
+                              redetect: int = 0) -> Tuple[List[int], float, int, int]:
+    """Face counts of frames [start, stop), saved to `checkpoint` every checkpoint_every frames.
+
+    A checkpoint left by an interrupted run of the same video, detector,
+    range, stride, decoder and tracking setting is resumed by seeking to the first frame it does not cover (its
+    last frame was a sample, so adaptive counting stays exact). The final
+    counts are saved with done=True until remove_checkpoints is called.
+    on_count(counts) is called after every dense or tracked count (for
+    progress); stats["calls"] gets the number of (full-frame) detector calls.
+    redetect > 0 follows faces between full detections (see count_faces_tracked).
+    """
+    counts, done, key = [], False, None
+    if checkpoint:
+        key = checkpoint_key(input_path, detector, resize_width, start, stop, stride, decoder, redetect)
+        counts, done = load_checkpoint(checkpoint, key)
+    if done:
+        fps, width, height, _ = video_info(input_path)
+        return counts, fps, width, height
+    if counts:
+        print(f"  Resuming from checkpoint at frame {start + len(counts)}")
+
+    frames, fps, width, height = open_frames(input_path, decoder, resize_width, detector.color, start + len(counts),
+                                             None if stop is None else stop - start - len(counts),
+                                             max(stride, detector.batch_size) + 1)
+    next_save = len(counts) + checkpoint_every
+
+    def maybe_save(counts):
+        nonlocal next_save
+        if checkpoint and len(counts) >= next_save:
+            save_checkpoint(checkpoint, key, counts)
+            next_save = len(counts) + checkpoint_every
+
+    def on_frame(counts):
+        maybe_save(counts)
+        if on_count is not None:
+            on_count(counts)
+
+    resumed = len(counts)
+    if redetect > 0:
+        _, calls, roi_calls = count_faces_tracked(frames, detector, resize_width, redetect, counts, on_frame)
+        if stats is not None:
+            stats["roi_calls"] = roi_calls
+    elif stride > 1:
+        _, calls = count_faces_adaptive(frames, detector, resize_width, stride, counts, maybe_save)
+    else:
+        for c in iter_face_counts(frames, detector, resize_width):
+            counts.append(c)
+            on_frame(counts)
+        calls = len(counts) - resumed
+    if stats is not None:
+        stats["calls"] = calls
+
+    if checkpoint:
+        save_checkpoint(checkpoint, key, counts, done=True)
+    return counts, fps, width, height
+
+
+def analyze_video_counts(input_path: str, resize_width: int, detector=None, progress: bool = True,
+                         stride: int = 1, decoder: str = "opencv", checkpoint: Optional[str] = None,
+                         checkpoint_every: int = 1000, redetect: int = 0) -> Tuple[List[int], float, int, int]:
+    """Per-frame face counts; stride > 1 detects adaptively (see count_faces_adaptive),
+    redetect > 0 tracks faces between full detections (see count_faces_tracked).
+
+    decoder "ffmpeg" has ffmpeg decode and scale the frames (see read_frames_ffmpeg).
+    With a checkpoint path, progress is saved every checkpoint_every frames
+    and an interrupted analysis resumes there (see count_frames_checkpointed).
+    """
+    if detector is None:
+        detector = load_detector()
 
-    counts = []
-    idx = 0
     start_time = time.time()
-    
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
-        c = detect_face_count(frame, cascade, resize_width=resize_width)
-        counts.append(c)
 
+    def show(counts):
         # Show processing speed every 100 frames
+        idx = len(counts) - 1
         if idx % 100 == 0:
             elapsed = time.time() - start_time
             if elapsed > 0:
@@ -184,16 +561,138 @@ def analyze_video_counts(input_path: str, resize_width: int) -> Tuple[List[int],
             else:
                 sys.stderr.write(f"\rAnalyzed {idx} frames ...")
             sys.stderr.flush()
-        idx += 1
 
-    cap.release()
+    stats = {}
+    counts, fps, width, height = count_frames_checkpointed(input_path, 0, None, resize_width, detector, stride, decoder,
+                                                           checkpoint, checkpoint_every, show if progress else None,
+                                                           stats, redetect)
+
     total_time = time.time() - start_time
     avg_processing_fps = len(counts) / total_time if total_time > 0 else 0
-    sys.stderr.write(f"\rAnalyzed {len(counts)} frames in {total_time:.1f}s (avg {avg_processing_fps:.1f} FPS). Done.\n")
+    if progress and redetect > 0:
+        sys.stderr.write(f"\rAnalyzed {len(counts)} frames with {stats['calls']} full and {stats['roi_calls']} region "
+                         f"detections in {total_time:.1f}s (avg {avg_processing_fps:.1f} FPS). Done.\n")
+    elif progress and stride > 1:
+        sys.stderr.write(f"Analyzed {len(counts)} frames with {stats['calls']} detector calls (stride {stride}) "
+                         f"in {total_time:.1f}s (avg {avg_processing_fps:.1f} FPS). Done.\n")
+    elif progress:
+        sys.stderr.write(f"\rAnalyzed {len(counts)} frames in {total_time:.1f}s (avg {avg_processing_fps:.1f} FPS). Done.\n")
     return counts, fps, width, height
 
 
-def write_output_opencv(input_path: str, output_path: str, keep_segments: List[Tuple[int, int]], fps: float, width: int, height: int):
+def video_info(input_path: str) -> Tuple[float, int, int, int]:
+    """fps, width, height and (header) frame count of a video."""
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video: {input_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, width, height, frames
+
+
+def probe_keyframes(input_path: str) -> Optional[Tuple[List[int], int]]:
+    """Frame indices (presentation order) of the keyframes and the number of frames.
+
+    Read from the packet headers with ffprobe, nothing is decoded.
+    Returns None if ffprobe is not available or fails.
+    """
+    if shutil.which("ffprobe") is None:
+        return None
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts,flags",
+        "-of", "csv=p=0",
+        input_path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+    pts, key = [], []
+    for line in out.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) < 2 or not parts[0].lstrip("-").isdigit():
+            continue
+        pts.append(int(parts[0]))
+        key.append("K" in parts[1])
+
+    # Packets come in decode order; rank by pts for the display index
+    order = sorted(range(len(pts)), key=pts.__getitem__)
+    keyframes = [rank for rank, i in enumerate(order) if key[i]]
+    return keyframes, len(pts)
+
+
+def split_ranges(input_path: str, n_ranges: int, min_frames: int = 300) -> List[Tuple[int, Optional[int]]]:
+    """Split a video into up to n_ranges [start, stop) frame ranges starting at keyframes.
+
+    Without ffprobe the ranges are split evenly; seeking still lands on the
+    exact frame, the decoder just has to run from the previous keyframe.
+    The last range has stop=None (read to the end).
+    """
+    probed = probe_keyframes(input_path)
+    if probed is not None:
+        keyframes, total = probed
+    else:
+        keyframes, total = None, video_info(input_path)[3]
+
+    n = max(1, min(n_ranges, total // max(min_frames, 1)))
+    targets = [round(total * k / n) for k in range(1, n)]
+    if keyframes:
+        bounds = sorted({min(keyframes, key=lambda kf: abs(kf - t)) for t in targets} - {0})
+    else:
+        bounds = targets
+
+    starts = [0] + bounds
+    stops = bounds + [None]
+    return list(zip(starts, stops))
+
+
+def analyze_range(input_path: str, start: int, stop: Optional[int], resize_width: int, detector,
+                  stride: int = 1, decoder: str = "opencv", checkpoint_every: int = 0,
+                  redetect: int = 0) -> List[int]:
+    """Face counts of frames [start, stop) of a video (to the end if stop is None).
+
+    With stride > 1 the range is counted adaptively; the range ends are
+    samples, so joined ranges still give the dense keep segments. With
+    checkpoint_every > 0 the range checkpoints to its own sidecar.
+    """
+    checkpoint = checkpoint_path_for(input_path, start) if checkpoint_every > 0 else None
+    counts, _, _, _ = count_frames_checkpointed(input_path, start, stop, resize_width, detector, stride, decoder,
+                                                checkpoint, checkpoint_every, redetect=redetect)
+    return counts
+
+
+def analyze_video_counts_parallel(input_path: str, resize_width: int, jobs: int, stride: int = 1,
+                                  detector: str = "haar", detector_model: Optional[str] = None,
+                                  threads: int = 0, decoder: str = "opencv",
+                                  checkpoint_every: int = 0, redetect: int = 0) -> Tuple[List[int], float, int, int]:
+    """Same result as analyze_video_counts, with keyframe-aligned ranges analyzed by `jobs` processes."""
+    fps, width, height, _ = video_info(input_path)
+    ranges = split_ranges(input_path, jobs, min_frames=int(30 * fps))
+    start_time = time.time()
+    with multiprocessing.Pool(min(jobs, len(ranges)), initializer=_init_worker,
+                              initargs=(detector, detector_model, threads)) as pool:
+        parts = pool.map(_analyze_range_job, [(input_path, i, start, stop, resize_width, stride, decoder, checkpoint_every, redetect)
+                                                for i, (start, stop) in enumerate(ranges)])
+
+    counts = []
+    for _, _, part, error in sorted(parts, key=lambda p: p[1]):
+        if error:
+            raise RuntimeError(error)
+        counts.extend(part)
+    total_time = time.time() - start_time
+    sys.stderr.write(f"Analyzed {len(counts)} frames in {len(ranges)} ranges in {total_time:.1f}s "
+                     f"(avg {len(counts) / max(total_time, 1e-9):.1f} FPS). Done.\n")
+    return counts, fps, width, height
+
+
+def write_output_opencv(input_path: str, output_path: str, keep_segments: List[Tuple[int, int]], fps: float, width: int, height: int,
+                        progress: bool = True):
     if not keep_segments:
         print("No segments to keep. Skipping video writing.")
         return
@@ -229,7 +728,7 @@ def write_output_opencv(input_path: str, output_path: str, keep_segments: List[T
             out.write(frame)
             kept += 1
 
-        if frame_idx % 200 == 0:
+        if progress and frame_idx % 200 == 0:
             sys.stderr.write(f"\rWrote {kept} frames ...")
             sys.stderr.flush()
 
@@ -237,7 +736,8 @@ def write_output_opencv(input_path: str, output_path: str, keep_segments: List[T
 
     cap.release()
     out.release()
-    sys.stderr.write(f"\rWrote {kept} frames. Done.\n")
+    if progress:
+        sys.stderr.write(f"\rWrote {kept} frames. Done.\n")
 
 
 def write_output_ffmpeg(input_path: str, output_path: str, keep_segments: List[Tuple[int, int]], fps: float):
@@ -288,6 +788,258 @@ def write_output_ffmpeg(input_path: str, output_path: str, keep_segments: List[T
         shutil.rmtree(tempdir, ignore_errors=True)
 
 
+# Encoders for the re-encoded edges of a smart cut, matching the source codec.
+# They repeat their parameter sets (SPS/PPS, VPS/SPS/PPS, VOL) before every
+# keyframe: the edges have other ones than the stream-copied GOPs, and the
+# concat demuxer keeps only those of the first piece in the mp4 header.
+SMART_CUT_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-x264-params", "repeat-headers=1"],
+    "hevc": ["-c:v", "libx265", "-preset", "veryfast", "-crf", "20", "-x265-params", "repeat-headers=1"],
+    "mpeg4": ["-c:v", "mpeg4", "-q:v", "2", "-bsf:v", "dump_extra=freq=keyframe"],
+}
+
+# Same for the stream-copied GOPs: bitstream filter that puts the source's
+# parameter sets in-band, and the mp4 tag for in-band parameter sets.
+SMART_CUT_INBAND = {
+    "h264": (["-bsf:v", "h264_mp4toannexb"], ["-tag:v", "avc3"]),
+    "hevc": (["-bsf:v", "hevc_mp4toannexb"], ["-tag:v", "hev1"]),
+    "mpeg4": (["-bsf:v", "dump_extra=freq=keyframe"], []),
+}
+
+
+def probe_video_stream(input_path: str) -> Optional[dict]:
+    """codec_name, profile, pix_fmt, width, height of the first video stream (None without ffprobe)."""
+    if shutil.which("ffprobe") is None:
+        return None
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,profile,pix_fmt,width,height",
+        "-of", "default=noprint_wrappers=1",
+        input_path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    return dict(line.split("=", 1) for line in out.splitlines() if "=" in line)
+
+
+def smart_cut_encoder(stream: dict) -> Optional[List[str]]:
+    """ffmpeg output options that re-encode in the source's codec, profile and pixel format."""
+    args = SMART_CUT_ENCODERS.get(stream.get("codec_name"))
+    if args is None:
+        return None
+    args = list(args)
+    profile = stream.get("profile", "").lower().replace("constrained ", "")
+    if stream.get("codec_name") == "h264" and profile in ("baseline", "main", "high"):
+        args += ["-profile:v", profile]
+    if stream.get("pix_fmt"):
+        args += ["-pix_fmt", stream["pix_fmt"]]
+    return args
+
+
+def probe_start_offset(input_path: str) -> float:
+    """Seconds from the start of the container to the first video frame.
+
+    ffmpeg's -ss counts from the container start, frame indices count from
+    the first video frame (0 without ffprobe or start times).
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=start_time:format=start_time",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        input_path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.split()
+    except (subprocess.CalledProcessError, OSError):
+        return 0.0
+    try:
+        stream_start, format_start = float(out[0]), float(out[1])
+    except (IndexError, ValueError):
+        return 0.0
+    return stream_start - format_start
+
+
+def count_packets(input_path: str) -> Optional[int]:
+    """Number of video packets, read from the container without decoding (None if ffprobe fails)."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-count_packets",
+        "-show_entries", "stream=nb_read_packets",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        input_path,
+    ]
+    try:
+        return int(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip())
+    except (subprocess.CalledProcessError, OSError, ValueError):
+        return None
+
+
+def count_decoded_frames(input_path: str, packets: Optional[int] = None) -> Optional[int]:
+    """Number of video frames that decode without errors, from the first `packets`
+    packets or the whole file (None if ffprobe fails or reports errors)."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-count_frames",
+        "-show_entries", "stream=nb_read_frames",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        input_path,
+    ]
+    if packets is not None:
+        cmd[-1:-1] = ["-read_intervals", f"%+#{packets}"]
+    try:
+        res = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    if res.stderr.strip():
+        return None
+    try:
+        return int(res.stdout.strip())
+    except ValueError:
+        return None
+
+
+def smart_cut_plan(keep_segments: List[Tuple[int, int]], keyframes: List[int], total: int) -> List[Tuple[int, int, bool]]:
+    """Split keep segments into (start, stop, copy) pieces.
+
+    Whole GOPs inside a segment (from its first keyframe up to the last
+    keyframe before its end, or the end of the video) are stream-copied,
+    the partial GOPs before and after them are re-encoded.
+    """
+    kf = sorted(set(keyframes))
+    pieces = []
+    for s, e in keep_segments:
+        stop = e + 1
+        i = bisect.bisect_left(kf, s)
+        j = bisect.bisect_right(kf, stop) - 1
+        k1 = kf[i] if i < len(kf) else None
+        k2 = stop if stop >= total else (kf[j] if j >= 0 else None)
+        if k1 is None or k2 is None or k2 <= k1:
+            pieces.append((s, stop, False))
+            continue
+        if s < k1:
+            pieces.append((s, k1, False))
+        pieces.append((k1, k2, True))
+        if k2 < stop:
+            pieces.append((k2, stop, False))
+    return pieces
+
+
+def write_output_ffmpeg_smart(input_path: str, output_path: str, keep_segments: List[Tuple[int, int]], fps: float):
+    """Like write_output_ffmpeg, but only the partial GOPs at the edges of the
+    kept segments are re-encoded (in the source codec); everything between
+    keyframes is stream-copied. Cuts stay on the same frames.
+
+    Falls back to write_output_ffmpeg without ffprobe, for other codecs, or
+    when a piece does not decode or the result misses frames.
+    """
+    if not keep_segments:
+        print("No segments to keep. Skipping video writing.")
+        return
+
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg not found in PATH. Install ffmpeg or use --method opencv.")
+
+    probed = probe_keyframes(input_path)
+    stream = probe_video_stream(input_path)
+    encoder = smart_cut_encoder(stream) if stream else None
+    if probed is None or encoder is None:
+        print("Smart cut not possible (no ffprobe or unsupported codec), re-encoding all segments.")
+        write_output_ffmpeg(input_path, output_path, keep_segments, fps)
+        return
+
+    keyframes, total = probed
+    pieces = smart_cut_plan(keep_segments, keyframes, total)
+    inband, tag = SMART_CUT_INBAND[stream["codec_name"]]
+    offset = probe_start_offset(input_path)
+    kept = sum(stop - start for start, stop, _ in pieces)
+
+    tempdir = tempfile.mkdtemp(prefix="face_segments_")
+    failed = None
+    try:
+        parts = []
+        for i, (start, stop, copy) in enumerate(pieces):
+            seg_path = os.path.join(tempdir, f"part_{i:04d}.mp4")
+            if copy:
+                # Seeking lands on the keyframe itself, packets are copied as they are
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-ss", f"{offset + (start + 0.25) / fps:.6f}",
+                    "-i", input_path,
+                    "-frames:v", str(stop - start),
+                    "-c", "copy",
+                    *inband,
+                    "-avoid_negative_ts", "make_zero",
+                    seg_path,
+                ]
+            else:
+                # Accurate seek (decodes from the previous keyframe, drops frames before start)
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-ss", f"{offset + max(start - 0.25, 0) / fps:.6f}",
+                    "-i", input_path,
+                    "-frames:v", str(stop - start),
+                    *encoder,
+                    "-c:a", "copy",
+                    seg_path,
+                ]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+            # The short re-encoded edges are decoded whole, copied GOPs only for
+            # their first second (leading frames of an open GOP fail there)
+            check = min(stop - start, max(1, int(round(fps)))) if copy else stop - start
+            decoded = count_decoded_frames(seg_path, check if copy else None)
+            if decoded != check:
+                failed = f"piece {start}-{stop} decodes to {decoded} of {check} frames"
+                break
+            parts.append(seg_path)
+
+        if failed is None:
+            failed = concat_smart_cut(parts, tempdir, output_path, tag, kept)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    if failed:
+        print(f"Smart cut failed ({failed}), re-encoding all segments.")
+        write_output_ffmpeg(input_path, output_path, keep_segments, fps)
+        return
+    copied = sum(stop - start for start, stop, copy in pieces if copy)
+    print(f"  Smart cut: {copied}/{kept} frames stream-copied, {len(pieces)} pieces")
+
+
+def concat_smart_cut(parts: List[str], tempdir: str, output_path: str, tag: List[str], kept: int) -> Optional[str]:
+    """Joins the smart-cut pieces; returns what went wrong, or None.
+
+    The result is checked by counting its video packets, nothing is decoded.
+    """
+    concat_file = os.path.join(tempdir, "concat.txt")
+    with open(concat_file, "w") as f:
+        for p in parts:
+            f.write(f"file '{p}'\n")
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    cmd_concat = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", concat_file,
+        "-c", "copy",
+        *tag,
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    subprocess.run(cmd_concat, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+    packets = count_packets(output_path)
+    if packets != kept:
+        return f"output has {packets} video packets instead of {kept}"
+    return None
+
+
 def write_minimal_output_opencv(input_path: str, output_path: str, fps: float, width: int, height: int):
     """Write a minimal placeholder video (1 frame) using OpenCV.
 
@@ -340,9 +1092,352 @@ def write_minimal_output_ffmpeg(input_path: str, output_path: str, fps: float, w
     subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
 
 
+def open_frame_writer(output_path: str, method: str, fps: float, width: int, height: int):
+    """Frame sink for the single-pass filter: returns (write(frame), close()).
+
+    "opencv" uses cv2.VideoWriter (mp4v), "ffmpeg" / "smart" pipe raw BGR
+    frames into libx264 with the same settings as write_output_ffmpeg (no audio).
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if method != "opencv":
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg not found in PATH. Install ffmpeg or use --method opencv.")
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-r", f"{fps:.6f}",
+            "-i", "-",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "22",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            output_path,
+        ]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        def close():
+            proc.stdin.close()
+            if proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed writing {output_path}")
+
+        return (lambda frame: proc.stdin.write(frame.tobytes())), close
+
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not out.isOpened():
+        raise RuntimeError(f"Failed to open VideoWriter: {output_path}")
+    return out.write, out.release
+
+
+def filter_video_single_pass(input_path: str, output_path: str, min_zero_seconds: float, resize_width: int,
+                             method: str = "opencv", detector=None, progress: bool = True) -> Tuple[List[int], float, int, int, int]:
+    """Detect faces and write the filtered video in one decode pass.
+
+    Frames without faces are held back (at most min_zero_seconds worth) until
+    it is clear whether their zero run is long enough to cut, so the kept
+    frames are exactly those of compute_keep_segments. If nothing is kept, the
+    first frame is written as a minimal placeholder.
+
+    Returns counts, fps, width, height and the number of kept frames.
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video: {input_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    min_zero_frames = int(math.ceil(min_zero_seconds * fps))
+
+    if detector is None:
+        detector = load_detector()
+
+    write, close = open_frame_writer(output_path, method, fps, width, height)
+    counts = []
+    held = []           # current zero run, while it is still shorter than min_zero_frames
+    cutting = False     # current zero run is long enough, drop its frames
+    first_frame = None
+    kept = 0
+    start_time = time.time()
+
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if first_frame is None:
+                first_frame = frame
+            c = detect_face_count(frame, detector, resize_width=resize_width)
+            counts.append(c)
+
+            if c > 0:
+                # Short zero run before a face: keep it
+                for f in held:
+                    write(f)
+                kept += len(held) + 1
+                held = []
+                cutting = False
+                write(frame)
+            elif not cutting:
+                held.append(frame)
+                if len(held) >= min_zero_frames:
+                    held = []
+                    cutting = True
+
+            if progress and len(counts) % 100 == 1:
+                elapsed = time.time() - start_time
+                sys.stderr.write(f"\rFiltered {len(counts)} frames, kept {kept} "
+                                 f"({len(counts) / max(elapsed, 1e-9):.1f} FPS) ...")
+                sys.stderr.flush()
+
+        # A short zero run at the end is kept as well
+        for f in held:
+            write(f)
+        kept += len(held)
+
+        if kept == 0 and first_frame is not None:
+            write(first_frame)
+    finally:
+        cap.release()
+        close()
+
+    if progress:
+        total_time = time.time() - start_time
+        sys.stderr.write(f"\rFiltered {len(counts)} frames, kept {kept} in {total_time:.1f}s "
+                         f"(avg {len(counts) / max(total_time, 1e-9):.1f} FPS). Done.\n")
+    return counts, fps, width, height, kept
+
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm'}
+
+
+def find_video_files(input_folder: str, target_date: Optional[str] = None) -> List[Path]:
+    """Video files directly inside a folder, optionally only those of one date."""
+    input_path = Path(input_folder)
+    video_files = [f for f in input_path.iterdir()
+                   if f.is_file() and f.suffix.lower() in VIDEO_EXTENSIONS]
+    if target_date:
+        video_files = [f for f in video_files if extract_date_from_filename(f.name) == target_date]
+    return video_files
+
+
+def find_hires_folders(data_folder: str) -> List[Path]:
+    """All 'hires' directories below data_folder (one per user)."""
+    return sorted(p for p in Path(data_folder).rglob("hires") if p.is_dir())
+
+
+def find_timestamp_file(video_file: Path) -> Path:
+    """Find corresponding timestamp file generically.
+
+    Rule: timestamps live in the same folder and are named
+      <user>_timestamps_<suffix>.txt
+    where <suffix> matches the tail of the video name after the last underscore
+    or, when chunked: replace _chunk<d>_ with _timestamps_.
+    """
+    base_name = video_file.stem
+    suffix = base_name.split("_")[-1]
+
+    # Try pattern based on replacing chunk with timestamps
+    candidate1 = re.sub(r"_chunk\d+_", "_timestamps_", video_file.name)
+    candidate1 = os.path.splitext(candidate1)[0] + ".txt"
+    tp1 = video_file.parent / candidate1
+    if tp1.exists():
+        return tp1
+
+    # Fallback: any file matching *_timestamps_<suffix>.txt
+    matches = list(video_file.parent.glob(f"*_timestamps_{suffix}.txt"))
+    if matches:
+        return matches[0]
+
+    # Last resort: search any *_timestamps_*.txt with same date token if present
+    date_token = extract_date_from_filename(video_file.name)
+    if date_token:
+        matches = list(video_file.parent.glob(f"*_timestamps_{date_token}*.txt"))
+    return matches[0] if matches else video_file.parent / (base_name + "_timestamps.txt")
+
+
+def output_video_path_for(video_file: Path, output_folder: Optional[str], in_place: bool) -> str:
+    if in_place:
+        return str(video_file)
+    if output_folder:
+        return str(Path(output_folder) / f"{video_file.stem}_filtered{video_file.suffix}")
+    return str(video_file.parent / f"{video_file.stem}_filtered{video_file.suffix}")
+
+
+def process_video(video_file: Path, output_folder: Optional[str], min_zero_seconds: float,
+                  resize_width: int, method: str, in_place: bool = False, force: bool = False,
+                  detector=None, log=print, progress: bool = True, single_pass: bool = False,
+                  adaptive: bool = False, decoder: str = "opencv", checkpoint_every: int = 1000,
+                  redetect: int = 0) -> str:
+    """Analyze one video, write its face counts and the filtered video.
+
+    adaptive runs the detector on a stride of frames (see count_faces_adaptive),
+    decoder selects who decodes the frames for the analysis (see open_frames),
+    redetect > 0 tracks faces between full detections (see count_faces_tracked).
+    The analysis checkpoints every checkpoint_every frames (0 disables) and
+    resumes from an interrupted run; checkpoints go once the counts are written.
+
+    The outcome is recorded in the folder's manifest, which also answers
+    the "already processed" check.
+
+    Returns "processed", "skipped" (face counts already present) or "error".
+    """
+    timestamp_path = find_timestamp_file(video_file)
+
+    if detector is None:
+        detector = load_detector()
+
+    # Check if already processed
+    if not force and is_already_processed(video_file, timestamp_path, detector):
+        log(f"  ✓ Already processed (face counts found in manifest / timestamp file)")
+        return "skipped"
+
+    if single_pass:
+        return process_video_single_pass(video_file, timestamp_path, output_folder, min_zero_seconds,
+                                         resize_width, method, in_place, detector, log, progress)
+
+    try:
+        # Analyze video
+        stride = adaptive_stride(video_info(str(video_file))[0], min_zero_seconds) if adaptive else 1
+        checkpoint = checkpoint_path_for(str(video_file)) if checkpoint_every > 0 else None
+        counts, fps, width, height = analyze_video_counts(str(video_file), resize_width, detector, progress,
+                                                          stride, decoder, checkpoint, checkpoint_every, redetect)
+    except Exception as e:
+        log(f"  ✗ Error processing {video_file.name}: {e}")
+        record_status(video_file, timestamp_path, "error", detector=detector)
+        return "error"
+
+    status = finish_video(video_file, timestamp_path, counts, fps, width, height, output_folder,
+                          min_zero_seconds, method, in_place, log, progress)
+    record_status(video_file, timestamp_path, status, len(counts), detector)
+    if status == "processed":
+        remove_checkpoints(str(video_file))
+    return status
+
+
+def process_video_single_pass(video_file: Path, timestamp_path: Path, output_folder: Optional[str],
+                              min_zero_seconds: float, resize_width: int, method: str, in_place: bool = False,
+                              detector=None, log=print, progress: bool = True) -> str:
+    """Counts and filtered video from one decode pass (see filter_video_single_pass)."""
+    output_video_path = output_video_path_for(video_file, output_folder, in_place)
+    if in_place:
+        # Write to a temporary file in the same directory and replace atomically
+        tmp_fd, write_path = tempfile.mkstemp(dir=str(video_file.parent), suffix=video_file.suffix)
+        os.close(tmp_fd)
+    else:
+        write_path = output_video_path
+
+    try:
+        counts, fps, width, height, kept = filter_video_single_pass(
+            str(video_file), write_path, min_zero_seconds, resize_width, method, detector, progress)
+        write_counts_to_timestamps(counts, fps, str(timestamp_path))
+        if in_place:
+            os.replace(write_path, output_video_path)
+    except Exception as e:
+        if in_place and os.path.exists(write_path):
+            os.remove(write_path)
+        log(f"  ✗ Error processing {video_file.name}: {e}")
+        record_status(video_file, timestamp_path, "error", detector=detector)
+        return "error"
+
+    record_status(video_file, timestamp_path, "processed", len(counts), detector)
+    total_frames = len(counts)
+    log(f"  Frames kept: {kept}/{total_frames} ({100.0*kept/max(total_frames, 1):.1f}%)")
+    log(f"  ✓ {'Overwritten' if in_place else 'Completed'}: {Path(output_video_path).name}")
+    return "processed"
+
+
+def finish_video(video_file: Path, timestamp_path: Path, counts: List[int], fps: float, width: int, height: int,
+                 output_folder: Optional[str], min_zero_seconds: float, method: str, in_place: bool = False,
+                 log=print, progress: bool = True) -> str:
+    """Write the face counts of an analyzed video and its filtered version.
+
+    Returns "processed" or "error".
+    """
+    output_video_path = output_video_path_for(video_file, output_folder, in_place)
+
+    try:
+        # Write face counts to timestamp file
+        write_counts_to_timestamps(counts, fps, str(timestamp_path))
+
+        # Compute filtering segments
+        keep_segments = compute_keep_segments(counts, fps, min_zero_seconds)
+        total_frames_kept = sum((e - s + 1) for s, e in keep_segments)
+        total_frames = len(counts)
+
+        log(f"  Keep segments: {len(keep_segments)} | frames kept: {total_frames_kept}/{total_frames} ({100.0*total_frames_kept/max(total_frames, 1):.1f}%)")
+
+        # If no segments to keep: create minimal placeholder video instead of deleting/skipping
+        if len(keep_segments) == 0:
+            try:
+                if in_place:
+                    tmp_fd, tmp_path = tempfile.mkstemp(dir=str(video_file.parent), suffix=video_file.suffix)
+                    os.close(tmp_fd)
+                    try:
+                        if method != "opencv":
+                            write_minimal_output_ffmpeg(str(video_file), tmp_path, fps, width, height)
+                        else:
+                            write_minimal_output_opencv(str(video_file), tmp_path, fps, width, height)
+                        os.replace(tmp_path, str(video_file))
+                        log(f"  ✓ Overwritten with minimal placeholder (no segments): {video_file.name}")
+                    except Exception as e:
+                        try:
+                            if os.path.exists(tmp_path):
+                                os.remove(tmp_path)
+                        finally:
+                            pass
+                        raise e
+                else:
+                    if method != "opencv":
+                        write_minimal_output_ffmpeg(str(video_file), output_video_path, fps, width, height)
+                    else:
+                        write_minimal_output_opencv(str(video_file), output_video_path, fps, width, height)
+                    log(f"  ✓ Wrote minimal placeholder (no segments): {Path(output_video_path).name}")
+            except Exception as de:
+                log(f"  ✗ Failed to write minimal placeholder for {video_file.name}: {de}")
+            return "processed"
+
+        # Write filtered video (handle in-place safely)
+        if in_place:
+            # Write to a temporary file in the same directory and replace atomically
+            tmp_fd, tmp_path = tempfile.mkstemp(dir=str(video_file.parent), suffix=video_file.suffix)
+            os.close(tmp_fd)
+            try:
+                if method == "smart":
+                    write_output_ffmpeg_smart(str(video_file), tmp_path, keep_segments, fps)
+                elif method == "ffmpeg":
+                    write_output_ffmpeg(str(video_file), tmp_path, keep_segments, fps)
+                else:
+                    write_output_opencv(str(video_file), tmp_path, keep_segments, fps, width, height, progress)
+                os.replace(tmp_path, str(video_file))
+                log(f"  ✓ Overwritten: {video_file.name}")
+            except Exception as we:
+                try:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                finally:
+                    pass
+                raise we
+        else:
+            if method == "smart":
+                write_output_ffmpeg_smart(str(video_file), output_video_path, keep_segments, fps)
+            elif method == "ffmpeg":
+                write_output_ffmpeg(str(video_file), output_video_path, keep_segments, fps)
+            else:
+                write_output_opencv(str(video_file), output_video_path, keep_segments, fps, width, height, progress)
+            log(f"  ✓ Completed: {Path(output_video_path).name}")
+        return "processed"
+
+    except Exception as e:
+        log(f"  ✗ Error processing {video_file.name}: {e}")
+        return "error"
+
+
 def process_folder(input_folder: str, output_folder: Optional[str], min_zero_seconds: float, 
                   resize_width: int, method: str, target_date: Optional[str] = None, 
-                  in_place: bool = False, force: bool = False):
+                  in_place: bool = False, force: bool = False, single_pass: bool = False,
+                  adaptive: bool = False, detector: str = "haar", detector_model: Optional[str] = None,
+                  threads: int = 0, decoder: str = "opencv", checkpoint_every: int = 1000, redetect: int = 0):
     """Process all video files in a folder."""
     input_path = Path(input_folder)
     
@@ -350,13 +1445,8 @@ def process_folder(input_folder: str, output_folder: Optional[str], min_zero_sec
         raise FileNotFoundError(f"Input folder does not exist: {input_folder}")
     
     # Find all video files
-    video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm'}
-    video_files = [f for f in input_path.iterdir() 
-                   if f.is_file() and f.suffix.lower() in video_extensions]
-    
-    # Filter by date if specified
+    video_files = find_video_files(input_folder, target_date)
     if target_date:
-        video_files = [f for f in video_files if extract_date_from_filename(f.name) == target_date]
         print(f"Filtering for date: {target_date}")
     
     if not video_files:
@@ -370,137 +1460,190 @@ def process_folder(input_folder: str, output_folder: Optional[str], min_zero_sec
     if not in_place and output_folder:
         output_path = Path(output_folder)
         output_path.mkdir(parents=True, exist_ok=True)
-    
+
+    detector = load_detector(detector, detector_model, threads)
     for i, video_file in enumerate(video_files, 1):
         print(f"\n[{i}/{len(video_files)}] Processing: {video_file.name}")
-        
-        # Find corresponding timestamp file generically.
-        # Rule: timestamps live in the same folder and are named
-        #   <user>_timestamps_<suffix>.txt
-        # where <suffix> matches the tail of the video name after the last underscore
-        # or, when chunked: replace _chunk<d>_ with _timestamps_.
-        import re
-        base_name = video_file.stem
-        suffix = base_name.split("_")[-1]
-
-        # Try pattern based on replacing chunk with timestamps
-        candidate1 = re.sub(r"_chunk\d+_", "_timestamps_", video_file.name)
-        candidate1 = os.path.splitext(candidate1)[0] + ".txt"
-        tp1 = video_file.parent / candidate1
-
-        # Fallback: any file matching *_timestamps_<suffix>.txt
-        pattern = f"*_timestamps_{suffix}.txt"
-        matches = list(video_file.parent.glob(pattern))
-
-        if tp1.exists():
-            timestamp_path = tp1
-        elif matches:
-            timestamp_path = matches[0]
-        else:
-            # Last resort: search any *_timestamps_*.txt with same date token if present
-            date_token = extract_date_from_filename(video_file.name)
-            if date_token:
-                matches = list(video_file.parent.glob(f"*_timestamps_{date_token}*.txt"))
-            timestamp_path = matches[0] if matches else video_file.parent / (base_name + "_timestamps.txt")
-        
-        # Check if already processed
-        if not force and check_if_processed(str(timestamp_path)):
-            print(f"  ✓ Already processed (face counts found in timestamp file)")
-            continue
-        
-        try:
-            # Analyze video
-            counts, fps, width, height = analyze_video_counts(str(video_file), resize_width)
-            
-            # Write face counts to timestamp file
-            write_counts_to_timestamps(counts, fps, str(timestamp_path))
-            
-            # Compute filtering segments
-            keep_segments = compute_keep_segments(counts, fps, min_zero_seconds)
-            total_frames_kept = sum((e - s + 1) for s, e in keep_segments)
-            total_frames = len(counts)
+        process_video(video_file, output_folder, min_zero_seconds, resize_width, method, in_place, force, detector,
+                      single_pass=single_pass, adaptive=adaptive, decoder=decoder,
+                      checkpoint_every=checkpoint_every, redetect=redetect)
 
-            print(f"  Keep segments: {len(keep_segments)} | frames kept: {total_frames_kept}/{total_frames} ({100.0*total_frames_kept/total_frames:.1f}%)")
 
-            # If no segments to keep: create minimal placeholder video instead of deleting/skipping
-            if len(keep_segments) == 0:
-                # Determine output path first
-                if in_place:
-                    output_video_path = str(video_file)
-                else:
-                    if output_folder:
-                        output_path = Path(output_folder)
-                        output_video_path = str(output_path / f"{video_file.stem}_filtered{video_file.suffix}")
-                    else:
-                        output_video_path = str(video_file.parent / f"{video_file.stem}_filtered{video_file.suffix}")
+# ---- Parallel batch mode ---- #
 
-                try:
-                    if in_place:
-                        tmp_fd, tmp_path = tempfile.mkstemp(dir=str(video_file.parent), suffix=video_file.suffix)
-                        os.close(tmp_fd)
-                        try:
-                            if method == "ffmpeg":
-                                write_minimal_output_ffmpeg(str(video_file), tmp_path, fps, width, height)
-                            else:
-                                write_minimal_output_opencv(str(video_file), tmp_path, fps, width, height)
-                            os.replace(tmp_path, str(video_file))
-                            print(f"  ✓ Overwritten with minimal placeholder (no segments): {video_file.name}")
-                        except Exception as e:
-                            try:
-                                if os.path.exists(tmp_path):
-                                    os.remove(tmp_path)
-                            finally:
-                                pass
-                            raise e
-                    else:
-                        if method == "ffmpeg":
-                            write_minimal_output_ffmpeg(str(video_file), output_video_path, fps, width, height)
-                        else:
-                            write_minimal_output_opencv(str(video_file), output_video_path, fps, width, height)
-                        print(f"  ✓ Wrote minimal placeholder (no segments): {Path(output_video_path).name}")
-                except Exception as de:
-                    print(f"  ✗ Failed to write minimal placeholder for {video_file.name}: {de}")
-                continue
+_worker_detector = None
 
-            # Determine output path
-            if in_place:
-                output_video_path = str(video_file)
-            else:
-                if output_folder:
-                    output_path = Path(output_folder)
-                    output_video_path = str(output_path / f"{video_file.stem}_filtered{video_file.suffix}")
-                else:
-                    output_video_path = str(video_file.parent / f"{video_file.stem}_filtered{video_file.suffix}")
-            
-            # Write filtered video (handle in-place safely)
-            if in_place:
-                # Write to a temporary file in the same directory and replace atomically
-                tmp_fd, tmp_path = tempfile.mkstemp(dir=str(video_file.parent), suffix=video_file.suffix)
-                os.close(tmp_fd)
-                try:
-                    if method == "ffmpeg":
-                        write_output_ffmpeg(str(video_file), tmp_path, keep_segments, fps)
-                    else:
-                        write_output_opencv(str(video_file), tmp_path, keep_segments, fps, width, height)
-                    os.replace(tmp_path, str(video_file))
-                    print(f"  ✓ Overwritten: {video_file.name}")
-                except Exception as we:
-                    try:
-                        if os.path.exists(tmp_path):
-                            os.remove(tmp_path)
-                    finally:
-                        pass
-                    raise we
-            else:
-                if method == "ffmpeg":
-                    write_output_ffmpeg(str(video_file), output_video_path, keep_segments, fps)
-                else:
-                    write_output_opencv(str(video_file), output_video_path, keep_segments, fps, width, height)
-                print(f"  ✓ Completed: {Path(output_video_path).name}")
-            
+
+def _init_worker(detector: str = "haar", detector_model: Optional[str] = None, threads: int = 0):
+    """Pool initializer: one detector per worker, single-threaded OpenCV unless threads is set (the pool is the parallelism)."""
+    global _worker_detector
+    cv2.setNumThreads(threads or 1)
+    _worker_detector = load_detector(detector, detector_model, threads)
+
+
+def _analyze_range_job(job):
+    input_path, part, start, stop, resize_width, stride, decoder, checkpoint_every, redetect = job
+    try:
+        counts = analyze_range(str(input_path), start, stop, resize_width, _worker_detector, stride, decoder,
+                               checkpoint_every, redetect)
+        return input_path, part, counts, None
+    except Exception as e:
+        return input_path, part, None, f"{e}"
+
+
+def _process_video_job(job):
+    video_file, output_folder, min_zero_seconds, resize_width, method, in_place, force, single_pass = job
+
+    def log(msg):
+        print(f"[{video_file.name}] {msg.strip()}", flush=True)
+
+    status = process_video(video_file, output_folder, min_zero_seconds, resize_width, method,
+                           in_place, force, _worker_detector, log=log, progress=False, single_pass=single_pass)
+    return video_file, status
+
+
+def _finish_video_job(job):
+    video_file, timestamp_path, counts, fps, width, height, output_folder, min_zero_seconds, method, in_place = job
+
+    def log(msg):
+        print(f"[{video_file.name}] {msg.strip()}", flush=True)
+
+    status = finish_video(video_file, timestamp_path, counts, fps, width, height, output_folder,
+                          min_zero_seconds, method, in_place, log=log, progress=False)
+    if status == "processed":
+        remove_checkpoints(str(video_file))
+    return video_file, status
+
+
+def process_parallel(folders: List[str], output_folder: Optional[str], min_zero_seconds: float,
+                     resize_width: int, method: str, target_date: Optional[str] = None,
+                     in_place: bool = False, force: bool = False, jobs: int = 1,
+                     min_range_seconds: float = 30.0, single_pass: bool = False,
+                     adaptive: bool = False, detector: str = "haar", detector_model: Optional[str] = None,
+                     threads: int = 0, decoder: str = "opencv", checkpoint_every: int = 1000,
+                     redetect: int = 0) -> dict:
+    """Process the videos of several folders with a pool of `jobs` worker processes.
+
+    Every video is split into up to `jobs` keyframe-aligned ranges (at least
+    min_range_seconds long) that are analyzed as separate tasks, longest
+    first, so a single long video also uses all workers. Once all ranges of a
+    video are in, their counts are joined in order (identical to a serial
+    analysis) and writing the counts and the filtered video is queued in the
+    same pool. Returns the aggregated summary (lists of videos per status).
+
+    Processed states are looked up in and recorded to the folders'
+    manifests by this process (by the workers with single_pass).
+
+    With single_pass every video is one task that analyzes and writes in the
+    same decode pass (largest files first). adaptive counts every range with
+    the detection stride of count_faces_adaptive. Every worker builds its own
+    `detector` backend with `threads` OpenCV threads (default 1). Every range
+    checkpoints to its own sidecar every checkpoint_every frames, so a rerun
+    with the same --jobs resumes the ranges of an interrupted run.
+    """
+    video_files = []
+    for folder in folders:
+        found = find_video_files(folder, target_date)
+        print(f"Found {len(found)} video files in {folder}")
+        video_files.extend(found)
+
+    summary = {"processed": [], "skipped": [], "error": []}
+    if not video_files:
+        return summary
+
+    if not in_place and output_folder:
+        Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+    parent_detector = load_detector(detector, detector_model)  # fail here once instead of in every pool worker
+
+    if single_pass:
+        video_files.sort(key=lambda f: f.stat().st_size, reverse=True)
+        job_args = [(f, output_folder, min_zero_seconds, resize_width, method, in_place, force, True) for f in video_files]
+        print(f"Processing {len(video_files)} videos in a single pass with {jobs} workers (largest first)")
+        with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(detector, detector_model, threads)) as pool:
+            for k, (video_file, status) in enumerate(pool.imap_unordered(_process_video_job, job_args), 1):
+                summary[status].append(video_file)
+                print(f"[{k}/{len(video_files)}] {video_file.name}: {status}", flush=True)
+        return summary
+
+    # Split every video that still needs work into ranges
+    pending = {}
+    tasks = []
+    for video_file in video_files:
+        timestamp_path = find_timestamp_file(video_file)
+        if not force and is_already_processed(video_file, timestamp_path, parent_detector):
+            print(f"[{video_file.name}] ✓ Already processed (face counts found in manifest / timestamp file)")
+            summary["skipped"].append(video_file)
+            continue
+        try:
+            fps, width, height, frames = video_info(str(video_file))
+            ranges = split_ranges(str(video_file), jobs, min_frames=int(min_range_seconds * fps))
         except Exception as e:
-            print(f"  ✗ Error processing {video_file.name}: {e}")
+            print(f"[{video_file.name}] ✗ Error processing {video_file.name}: {e}")
+            summary["error"].append(video_file)
             continue
+        pending[video_file] = {"info": (timestamp_path, fps, width, height), "parts": [None] * len(ranges), "error": None}
+        for i, (start, stop) in enumerate(ranges):
+            length = (stop if stop is not None else max(frames, start)) - start
+            stride = adaptive_stride(fps, min_zero_seconds) if adaptive else 1
+            tasks.append((length, (video_file, i, start, stop, resize_width, stride, decoder, checkpoint_every,
+                                   redetect)))
+
+    if not tasks:
+        return summary
+
+    tasks.sort(key=lambda t: t[0], reverse=True)
+    print(f"Processing {len(pending)} videos as {len(tasks)} ranges with {jobs} workers (longest first)")
+    start_time = time.time()
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(detector, detector_model, threads)) as pool:
+        finishing = []
+        for video_file, part, counts, error in pool.imap_unordered(_analyze_range_job, [t[1] for t in tasks]):
+            entry = pending[video_file]
+            if error:
+                entry["error"] = error
+            entry["parts"][part] = counts if counts is not None else []
+            if any(p is None for p in entry["parts"]):
+                continue
+
+            timestamp_path, fps, width, height = entry["info"]
+            if entry["error"]:
+                print(f"[{video_file.name}] ✗ Error processing {video_file.name}: {entry['error']}")
+                record_status(video_file, timestamp_path, "error", detector=parent_detector)
+                summary["error"].append(video_file)
+                continue
+            counts = [c for p in entry["parts"] for c in p]
+            entry["frames"] = len(counts)
+            print(f"[{video_file.name}] Analyzed {len(counts)} frames in {len(entry['parts'])} ranges", flush=True)
+            finishing.append(pool.apply_async(_finish_video_job, ((
+                video_file, timestamp_path, counts, fps, width, height,
+                output_folder, min_zero_seconds, method, in_place,
+            ),)))
+
+        for k, result in enumerate(finishing, 1):
+            video_file, status = result.get()
+            record_status(video_file, pending[video_file]["info"][0], status, pending[video_file]["frames"], parent_detector)
+            summary[status].append(video_file)
+            elapsed = time.time() - start_time
+            print(f"[{k}/{len(finishing)}] {video_file.name}: {status} after {elapsed / 60:.1f} min", flush=True)
+
+    return summary
+
+
+def print_summary(summary: dict):
+    print("===== SUMMARY =====")
+    print(f"Total videos processed: {len(summary['processed'])}")
+    print(f"Total videos skipped (already processed): {len(summary['skipped'])}")
+    print(f"Total videos with errors: {len(summary['error'])}")
+    if summary["skipped"]:
+        print()
+        print("===== ALREADY PROCESSED FILES =====")
+        for f in summary["skipped"]:
+            print(f"  {f}")
+    if summary["error"]:
+        print()
+        print("===== FILES WITH ERRORS =====")
+        for f in summary["error"]:
+            print(f"  {f}")
 
 
 def main():
@@ -512,6 +1655,8 @@ def main():
     parser.add_argument("--date", help="Process only videos from specific date (YYYY-MM-DD format)")
     parser.add_argument("--in-place", action="store_true", help="Overwrite original files instead of creating new ones")
     parser.add_argument("--force", action="store_true", help="Process even if already processed (overwrite existing face counts)")
+    parser.add_argument("--data", help="Process the 'hires' folders of all users below this data folder")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Number of worker processes; long videos are split at keyframes across them")
     
     # Original single file arguments
     parser.add_argument("--input", "-i", help="Path to input video (for single file processing)")
@@ -521,12 +1666,63 @@ def main():
     # Common arguments
     parser.add_argument("--min-zero-seconds", type=float, default=2.0, help="Minimum consecutive zero-face duration to remove (seconds)")
     parser.add_argument("--resize-width", type=int, default=640, help="Resize width for detection (lower = faster)")
-    parser.add_argument("--method", choices=["ffmpeg", "opencv"], default="ffmpeg", help="How to write output video (ffmpeg preserves audio)")
+    parser.add_argument("--method", choices=["ffmpeg", "smart", "opencv"], default="ffmpeg",
+                        help="How to write output video (ffmpeg preserves audio; smart stream-copies whole GOPs and re-encodes only the edges)")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Detect and write in the same decode pass, holding back at most --min-zero-seconds of frames (no audio)")
+    parser.add_argument("--detector", choices=list(DETECTORS), default="haar",
+                        help="Face detector backend (yunet/ssd models go to models/, mediapipe uses face_landmarker.task)")
+    parser.add_argument("--detector-model", help="Model file for the detector (default: its standard file name)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="OpenCV threads per process (default: OpenCV's choice, 1 per worker with --jobs)")
+    parser.add_argument("--decoder", choices=["opencv", "ffmpeg"], default="opencv",
+                        help="Decoder for the analysis (ffmpeg pipes frames already scaled to --resize-width)")
+    parser.add_argument("--checkpoint-every", type=int,
+                        help="Save analysis progress next to the video every N frames and resume from it (default 1000, 0 disables)")
+    parser.add_argument("--track", action="store_true",
+                        help="Follow faces with optical flow and confirm them on a region around the last box; full-frame detection every --redetect-every frames or when a face is lost")
+    parser.add_argument("--redetect-every", type=int, help="Frames between full-frame detections with --track (default 10)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Run the detector on every k-th frame only (k = --min-zero-seconds of frames) and re-check densely where needed; same cuts")
     
     args = parser.parse_args()
+    if args.track and args.adaptive:
+        parser.error("--track and --adaptive cannot be combined")
+    if args.single_pass:
+        # The single-pass filter always runs the plain detector on every frame
+        for flag, used in (("--adaptive", args.adaptive), ("--decoder", args.decoder != "opencv"),
+                           ("--checkpoint-every", args.checkpoint_every is not None), ("--track", args.track),
+                           ("--redetect-every", args.redetect_every is not None),
+                           ("--jobs", args.input and args.jobs > 1)):
+            if used:
+                parser.error(f"--single-pass cannot be combined with {flag}")
+    if args.checkpoint_every is None:
+        args.checkpoint_every = 1000
+    if args.redetect_every is None:
+        args.redetect_every = 10
+    redetect = max(1, args.redetect_every) if args.track else 0
     
     # Determine processing mode
-    if args.folder:
+    if args.data or (args.folder and args.jobs > 1):
+        # Parallel batch mode over one or all users' hires folders
+        folders = [str(p) for p in find_hires_folders(args.data)] if args.data else [args.folder]
+        output_folder = args.output_folder if not args.in_place else None
+        if not args.in_place and not output_folder and args.folder:
+            input_path = Path(args.folder)
+            output_folder = str(input_path.parent / (input_path.name + "_filtered"))
+        if not folders:
+            print(f"No 'hires' directories found in {args.data}")
+        summary = process_parallel(folders, output_folder, args.min_zero_seconds, args.resize_width,
+                                   args.method, args.date, args.in_place, args.force, max(1, args.jobs),
+                                   single_pass=args.single_pass, adaptive=args.adaptive, detector=args.detector,
+                                   detector_model=args.detector_model, threads=args.threads, decoder=args.decoder,
+                                   checkpoint_every=args.checkpoint_every, redetect=redetect)
+        print_summary(summary)
+        if summary["error"]:
+            print("Done.")
+            sys.exit(1)
+
+    elif args.folder:
         # Batch processing mode
         input_folder = args.folder
         output_folder = args.output_folder if not args.in_place else None
@@ -537,12 +1733,32 @@ def main():
             output_folder = str(input_path.parent / (input_path.name + "_filtered"))
         
         process_folder(input_folder, output_folder, args.min_zero_seconds, args.resize_width, 
-                      args.method, args.date, args.in_place, args.force)
+                      args.method, args.date, args.in_place, args.force, args.single_pass, args.adaptive,
+                      args.detector, args.detector_model, args.threads, args.decoder, args.checkpoint_every,
+                      redetect)
         
+    elif args.input and args.output and args.counts and args.single_pass:
+        counts, fps, width, height, kept = filter_video_single_pass(
+            args.input, args.output, args.min_zero_seconds, args.resize_width, args.method,
+            load_detector(args.detector, args.detector_model, args.threads))
+        write_counts_csv(counts, fps, args.counts)
+        print(f"Frames kept: {kept}/{len(counts)} ({100.0*kept/max(len(counts), 1):.1f}%)")
+
     elif args.input and args.output and args.counts:
         # Single file processing mode (original functionality)
-        counts, fps, width, height = analyze_video_counts(args.input, args.resize_width)
+        stride = adaptive_stride(video_info(args.input)[0], args.min_zero_seconds) if args.adaptive else 1
+        if args.jobs > 1:
+            counts, fps, width, height = analyze_video_counts_parallel(args.input, args.resize_width, args.jobs, stride,
+                                                                       args.detector, args.detector_model, args.threads,
+                                                                       args.decoder, args.checkpoint_every, redetect)
+        else:
+            detector = load_detector(args.detector, args.detector_model, args.threads)
+            checkpoint = checkpoint_path_for(args.input) if args.checkpoint_every > 0 else None
+            counts, fps, width, height = analyze_video_counts(args.input, args.resize_width, detector, stride=stride,
+                                                              decoder=args.decoder, checkpoint=checkpoint,
+                                                              checkpoint_every=args.checkpoint_every, redetect=redetect)
         write_counts_csv(counts, fps, args.counts)
+        remove_checkpoints(args.input)
 
         keep_segments = compute_keep_segments(counts, fps, args.min_zero_seconds)
         total_frames_kept = sum((e - s + 1) for s, e in keep_segments)
@@ -552,7 +1768,7 @@ def main():
         if len(keep_segments) == 0:
             # Produce a minimal placeholder output
             try:
-                if args.method == "ffmpeg":
+                if args.method != "opencv":
                     write_minimal_output_ffmpeg(args.input, args.output, fps, width, height)
                 else:
                     write_minimal_output_opencv(args.input, args.output, fps, width, height)
@@ -560,7 +1776,9 @@ def main():
             except Exception as e:
                 print(f"Failed to write minimal placeholder output: {e}")
         else:
-            if args.method == "ffmpeg":
+            if args.method == "smart":
+                write_output_ffmpeg_smart(args.input, args.output, keep_segments, fps)
+            elif args.method == "ffmpeg":
                 write_output_ffmpeg(args.input, args.output, keep_segments, fps)
             else:
                 write_output_opencv(args.input, args.output, keep_segments, fps, width, height)
@@ -588,7 +1806,10 @@ def main():
             print(f"No arguments provided. Processing default folder: {default_folder}")
             print("Using --in-place mode (original files will be overwritten)")
             process_folder(default_folder, None, args.min_zero_seconds, args.resize_width, 
-                          args.method, args.date, in_place=True, force=args.force)
+                          args.method, args.date, in_place=True, force=args.force, single_pass=args.single_pass,
+                          adaptive=args.adaptive, detector=args.detector, detector_model=args.detector_model,
+                          threads=args.threads, decoder=args.decoder, checkpoint_every=args.checkpoint_every,
+                          redetect=redetect)
         else:
             parser.print_help()
             print(f"\nError: Default folder '{default_folder}' not found.")
@@ -3,6 +3,7 @@
 # Script to filter all videos in all subdirectories of a data folder
 # Usage: ./video_filter_all.sh [data_folder]
 # If no folder is provided, uses 'data' as default
+# Set JOBS to limit the number of worker processes (default: number of cores)
 
 # Get the directory where this script is located
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
@@ -43,69 +44,23 @@ if [ ! -f "video_filter.py" ]; then
     exit 1
 fi
 
-# Initialize counters
-total_processed=0
-total_skipped=0
-total_errors=0
-
-echo "Searching for 'hires' directories with video files..."
-
-echo "Finding 'hires' directories with video files..."
-
-# Process each directory as it is found (streaming)
-found_any=false
-while IFS= read -r dir; do
-    found_any=true
-    echo "===== Processing directory: $dir ====="
-    
-    # Count videos in this directory
-    video_count=$(find "$dir" -maxdepth 1 -name "*.mp4" | wc -l)
-    echo "Found $video_count video files in $dir"
-    
-    if [ "$video_count" -gt 0 ]; then
-        # Process videos in this directory
-        python video_filter.py \
-            --folder "$dir" \
-            --in-place \
-            --min-zero-seconds 2.0
-        
-        # Check exit code
-        if [ $? -eq 0 ]; then
-            echo "✓ Successfully processed $dir"
-            total_processed=$((total_processed + video_count))
-        else
-            echo "✗ Error processing $dir"
-            total_errors=$((total_errors + video_count))
-        fi
-    else
-        echo "⚠ No video files found in $dir"
-        total_skipped=$((total_skipped + 1))
-    fi
-    
-    echo
-done < <(find "$DATA_FOLDER" -type d -name "hires" -exec sh -c 'd="$1"; ls "$d"/*.mp4 >/dev/null 2>&1 && echo "$d"' _ {} \;)
-
-if [ "$found_any" = false ]; then
-    echo "No 'hires' directories with video files found in $DATA_FOLDER"
-    exit 0
+# Number of worker processes (default: all cores)
+JOBS="${JOBS:-$(nproc)}"
+
+# One Python process finds the 'hires' directories of all users, spreads the
+# videos over a pool of $JOBS workers (longest first) and prints the summary
+# (processed / already processed / errors) at the end. Already processed
+# chunks are looked up in the .video_filter.sqlite manifest of each folder
+echo "Processing videos of all 'hires' directories with $JOBS workers..."
+
+python video_filter.py \
+    --data "$DATA_FOLDER" \
+    --in-place \
+    --min-zero-seconds 2.0 \
+    --jobs "$JOBS"
+
+if [ $? -eq 0 ]; then
+    echo "Processing completed!"
+else
+    echo "Processing completed with errors!"
 fi
-
-echo "===== SUMMARY ====="
-echo "Total videos processed: $total_processed"
-echo "Total directories skipped: $total_skipped"
-echo "Total videos with errors: $total_errors"
-echo "Processing completed!"
-
-# Show which files were already processed (skipped)
-echo
-echo "===== ALREADY PROCESSED FILES ====="
-echo "The following files were skipped because they were already processed:"
-
-find "$DATA_FOLDER" -name "*_timestamps_*.txt" -exec grep -l "face_count" {} \; | while read -r timestamp_file; do
-    # Derive the most likely corresponding video name generically by replacing _timestamps_ with _chunk0_
-    base=$(basename "$timestamp_file")
-    video_name="${base/_timestamps_/_chunk0_}"
-    video_name="${video_name%.txt}.mp4"
-    video_dir=$(dirname "$timestamp_file")
-    echo "  $video_dir/$video_name"
-done